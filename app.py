@@ -5,17 +5,24 @@ An intelligent agent that conducts interviews to build AI portfolios.
 """
 
 import streamlit as st
+import csv
 import json
-import re
 import os
-import pandas as pd
+import time
+import uuid
 from datetime import datetime
-from src.agent_prompt import AGENT_SYSTEM_PROMPT
-from src.roi_calculations import compute_all_roi
-from src.portfolio_logic import select_portfolio
-from src.canvas_builder import build_canvas, canvas_to_markdown
-from src.visual_canvas import generate_visual_canvas_html
-from src.png_export import get_png_bytes
+# Heavy modules (pandas, the agent prompt and backend, renderers) are
+# imported where first used to keep cold starts fast; see check_import_time.py
+from src.claude_client import CacheStats
+from src.conversation import ConversationManager
+from src.data_blocks import DataBlockParser, message_display_text
+from src.dependency_graph import DependencyCycleError
+from src.pipeline_state import PipelineState, merge_use_cases, rebind_portfolio
+from src.session_store import get_session_writer, restore_session, valid_session_id
+from src.instrumentation import (
+    stage, record_stage, set_session, get_metrics_registry, enabled as metrics_enabled
+)
+from src.render_cache import get_render_cache, canvas_key
 
 # Page configuration
 st.set_page_config(
@@ -25,14 +32,69 @@ st.set_page_config(
 )
 
 
+# Session state saved to the session store and restored on resume
+PERSISTED_KEYS = ["use_cases", "org_info", "portfolio", "canvas", "phase"]
+
+
+def start_session():
+    """
+    Resume the session named in the URL (?session=<id>) from the session
+    store, or start a new one. The id is written back to the URL so a
+    reload, or any replica sharing the store, picks the interview up again.
+    """
+    writer = get_session_writer()
+    requested = st.query_params.get("session")
+    restored = None
+    if writer and valid_session_id(requested):
+        writer.flush(timeout=2)  # this process may still be writing it
+        restored = restore_session(writer.store, requested)
+    
+    if restored:
+        st.session_state.session_id = requested
+        st.session_state.messages = restored["messages"]
+        state = restored["state"]
+        for key in PERSISTED_KEYS:
+            if key in state:
+                st.session_state[key] = state[key]
+        st.session_state.pipeline = PipelineState.from_dict(state.get("pipeline") or {})
+        st.session_state.persisted_messages = len(restored["messages"])
+    else:
+        st.session_state.session_id = uuid.uuid4().hex
+        st.session_state.persisted_messages = 0
+    st.query_params["session"] = st.session_state.session_id
+
+
+def persist_session():
+    """Queue new messages and a state snapshot for the background writer."""
+    writer = get_session_writer()
+    if writer is None:
+        return
+    session_id = st.session_state.session_id
+    messages = st.session_state.messages
+    start = st.session_state.get("persisted_messages", 0)
+    if len(messages) > start:
+        writer.append_messages(session_id, start, messages[start:])
+        st.session_state.persisted_messages = len(messages)
+    
+    # Top-level containers are copied; the writer serializes them later
+    state = {key: st.session_state.get(key) for key in PERSISTED_KEYS}
+    state["use_cases"] = list(state["use_cases"] or [])
+    state["pipeline"] = st.session_state.pipeline.to_dict()
+    writer.save_snapshot(session_id, state, len(messages))
+
+
 def initialize_session_state():
     """Initialize session state variables."""
+    if "session_id" not in st.session_state:
+        start_session()
     if "messages" not in st.session_state:
         st.session_state.messages = []
     if "use_cases" not in st.session_state:
         st.session_state.use_cases = []
     if "org_info" not in st.session_state:
         st.session_state.org_info = {}
+    if "pipeline" not in st.session_state:
+        st.session_state.pipeline = PipelineState()
     if "roi_computed" not in st.session_state:
         st.session_state.roi_computed = False
     if "portfolio" not in st.session_state:
@@ -50,6 +112,10 @@ def initialize_session_state():
         )
     if "api_enabled" not in st.session_state:
         st.session_state.api_enabled = False
+    if "conversation" not in st.session_state:
+        st.session_state.conversation = ConversationManager()
+    if "cache_stats" not in st.session_state:
+        st.session_state.cache_stats = CacheStats()
     
     # Initialize widget keys for form inputs
     if "quick_title" not in st.session_state:
@@ -66,10 +132,48 @@ def initialize_session_state():
         st.session_state.quick_effort = 3
 
 
-def call_claude(messages, api_key):
-    """Call Claude API for conversational responses."""
-    if not api_key:
-        return """⚠️ **API Key Required for Conversational Intelligence**
+def sync_pipeline():
+    """
+    Bring derived results up to date with the use cases.
+    
+    Once ROI has been requested, new or edited use cases are scored (only
+    those). The portfolio and canvas are dropped only when an input they
+    were built from changed; descriptive edits refresh the portfolio's
+    copies of the use cases and just invalidate the canvas.
+    """
+    pipeline = st.session_state.pipeline
+    if pipeline.roi_enabled and st.session_state.use_cases:
+        st.session_state.use_cases, _ = pipeline.update_roi(st.session_state.use_cases)
+    # roi_computed now means "every current use case has metrics"
+    st.session_state.roi_computed = pipeline.roi_enabled and bool(st.session_state.use_cases)
+    
+    use_cases = st.session_state.use_cases
+    portfolio = st.session_state.portfolio
+    if not portfolio:
+        return
+    if not pipeline.portfolio_current(use_cases, portfolio):
+        st.session_state.portfolio = None
+        st.session_state.canvas = None
+        st.session_state.frontier_pick = None
+        st.session_state.phase = "roi"
+    elif not pipeline.data_current(use_cases, st.session_state.org_info, portfolio):
+        st.session_state.portfolio = rebind_portfolio(portfolio, use_cases)
+        st.session_state.canvas = None
+        pipeline.record_data(use_cases, st.session_state.org_info, st.session_state.portfolio)
+
+
+def stream_claude(messages, api_key, turn=None):
+    """
+    Stream Claude's conversational response as text deltas.
+    
+    turn is the index of the latest user message in the full conversation
+    (messages may be compacted); it tells a repeated message apart from a
+    rerun of the same one. Set ROI_AGENT_FAKE_CLIENT=1 to stream a canned reply from a local fake
+    client instead of calling the API.
+    """
+    use_fake_client = bool(os.environ.get("ROI_AGENT_FAKE_CLIENT"))
+    if not api_key and not use_fake_client:
+        yield """⚠️ **API Key Required for Conversational Intelligence**
 
 I need an Anthropic API key to have intelligent conversations with you.
 
@@ -85,27 +189,29 @@ Enter your API key in the sidebar text box.
 You can still use the "Quick Add Use Case" feature in the sidebar to manually enter data without an API key.
 
 Get your API key from: https://console.anthropic.com/"""
+        return
+    
+    from src.agent_prompt import AGENT_SYSTEM_PROMPT
+    from src.agent_backend import get_agent_backend
     
     try:
-        from anthropic import Anthropic
-        
-        # Initialize client - Anthropic 0.21.0
-        client = Anthropic(api_key=api_key)
-        
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=4000,
+        # The call runs on the background backend; a rerun while it is in
+        # flight re-attaches to the same call instead of sending a duplicate
+        pending = get_agent_backend().submit(
+            st.session_state.session_id,
+            messages,
+            api_key,
             system=AGENT_SYSTEM_PROMPT,
-            messages=messages
+            turn=turn
         )
+        yield from pending.iter_text()
         
         # Mark API as enabled on successful call
         st.session_state.api_enabled = True
-        
-        return response.content[0].text
+        st.session_state.cache_stats.record(pending.usage)
         
     except ImportError:
-        return """⚠️ **Anthropic SDK Not Installed**
+        yield """⚠️ **Anthropic SDK Not Installed**
 
 Please install it with:
 ```bash
@@ -117,7 +223,7 @@ Then restart the app."""
     except Exception as e:
         error_str = str(e).lower()
         if "api" in error_str or "key" in error_str or "auth" in error_str:
-            return f"""⚠️ **API Authentication Error**
+            yield f"""⚠️ **API Authentication Error**
 
 Your API key may be invalid or expired.
 
@@ -125,14 +231,14 @@ Error: {str(e)}
 
 Check your key at: https://console.anthropic.com/"""
         else:
-            return f"""⚠️ **Unexpected Error**
+            yield f"""⚠️ **Unexpected Error**
 
 {str(e)}"""
         
     except Exception as e:
         error_msg = str(e)
         if "api_key" in error_msg.lower() or "authentication" in error_msg.lower():
-            return f"""⚠️ **Invalid API Key**
+            yield f"""⚠️ **Invalid API Key**
 
 Your API key appears to be invalid or expired.
 
@@ -140,7 +246,7 @@ Error: {error_msg}
 
 Please check your key at: https://console.anthropic.com/"""
         else:
-            return f"""⚠️ **API Error**
+            yield f"""⚠️ **API Error**
 
 Error: {error_msg}
 
@@ -150,24 +256,38 @@ If this persists, try:
 3. Check you have API credits available"""
 
 
-def extract_data_blocks(text):
-    """Extract structured data from agent responses."""
-    use_case_pattern = r'<USE_CASE_DATA>(.*?)</USE_CASE_DATA>'
-    org_pattern = r'<ORG_DATA>(.*?)</ORG_DATA>'
-    budget_pattern = r'<EFFORT_BUDGET>(.*?)</EFFORT_BUDGET>'
-    canvas_pattern = r'<GENERATE_CANVAS>(.*?)</GENERATE_CANVAS>'
-    
-    use_cases = re.findall(use_case_pattern, text, re.DOTALL)
-    org_data = re.findall(org_pattern, text, re.DOTALL)
-    budget_data = re.findall(budget_pattern, text, re.DOTALL)
-    canvas_trigger = re.findall(canvas_pattern, text, re.DOTALL)
-    
-    return {
-        'use_cases': [json.loads(uc) for uc in use_cases],
-        'org_data': json.loads(org_data[0]) if org_data else None,
-        'effort_budget': json.loads(budget_data[0]) if budget_data else None,
-        'generate_canvas': len(canvas_trigger) > 0
-    }
+def render_metrics_panel():
+    """Live per-stage timings for this session (ROI_AGENT_METRICS=1)."""
+    registry = get_metrics_registry()
+    rows = registry.snapshot(st.session_state.session_id)
+    with st.expander("⏱️ Stage Metrics"):
+        if not rows:
+            st.caption("No stages recorded yet")
+            return
+        table = ["| Stage | Calls | Total | Max | Alloc |", "|---|---:|---:|---:|---:|"]
+        for row in rows:
+            table.append(
+                f"| {row['stage']} | {row['calls']} | {row['total_seconds'] * 1000:,.1f} ms "
+                f"| {row['max_seconds'] * 1000:,.1f} ms | {row['peak_alloc_bytes'] / 1024:,.0f} KiB |"
+            )
+        st.markdown("\n".join(table))
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "Prometheus",
+                data=registry.to_prometheus(),
+                file_name="roi_agent_metrics.prom",
+                mime="text/plain",
+                use_container_width=True
+            )
+        with col2:
+            st.download_button(
+                "JSON Lines",
+                data=registry.to_json_lines(),
+                file_name="roi_agent_metrics.jsonl",
+                mime="application/x-ndjson",
+                use_container_width=True
+            )
 
 
 def render_sidebar():
@@ -227,6 +347,31 @@ def render_sidebar():
         st.markdown(f"**Portfolio Selected:** {'✅' if st.session_state.portfolio else '⬜'}")
         st.markdown(f"**Canvas Generated:** {'✅' if st.session_state.canvas else '⬜'}")
         
+        writer = get_session_writer()
+        if writer and writer.errors:
+            st.warning(f"⚠️ Session not saved: {writer.errors[-1]}")
+        
+        if st.session_state.conversation.total_tokens_saved:
+            st.caption(f"Context compaction saved ~{st.session_state.conversation.total_tokens_saved:,} tokens")
+        
+        cache_stats = st.session_state.cache_stats
+        if cache_stats.requests:
+            st.caption(
+                f"Prompt cache: {cache_stats.cache_hits}/{cache_stats.requests} hits, "
+                f"{cache_stats.cache_read_tokens:,} tokens read from cache"
+            )
+        
+        if st.session_state.get("data_block_errors"):
+            with st.expander(f"⚠️ {len(st.session_state.data_block_errors)} malformed data block(s) skipped"):
+                for error in st.session_state.data_block_errors:
+                    st.caption(f"**{error['tag']}**: {error['error']}")
+        
+        if st.session_state.get("dependency_error"):
+            st.error(f"⚠️ {st.session_state.dependency_error}. Fix the use case dependencies to continue.")
+        
+        if metrics_enabled():
+            render_metrics_panel()
+        
         st.markdown("---")
         
         # Quick add use case (for demo/testing)
@@ -272,47 +417,193 @@ def render_sidebar():
                 st.success(f"Added {uc_title}!")
                 st.rerun()
         
+        with st.expander("📥 Bulk Import (CSV / Parquet / JSONL)"):
+            st.caption("One use case per row; invalid rows are skipped and reported")
+            upload = st.file_uploader("Use case file", type=["csv", "parquet", "jsonl", "ndjson"], key="bulk_file")
+            namespace = st.text_input(
+                "Namespace",
+                key="bulk_namespace",
+                help="Optional prefix for imported ids (e.g. finance/UC001) so they never collide with existing use cases"
+            )
+            if upload is not None and st.button("Import Use Cases", use_container_width=True):
+                from src.bulk_import import import_use_cases, detect_format
+                upload.seek(0)
+                try:
+                    # Generated ids get a prefix unique to this import, and
+                    # rows reusing an id already in the session are rejected
+                    result = import_use_cases(
+                        upload,
+                        detect_format(upload.name),
+                        tenant=namespace.strip() or None,
+                        id_prefix=f"IMP{uuid.uuid4().hex[:6].upper()}-",
+                        existing_ids={uc.get("id") for uc in st.session_state.use_cases},
+                        **st.session_state.pipeline.finance()
+                    )
+                except (ValueError, ImportError, csv.Error) as e:
+                    st.session_state.import_report = {"file": upload.name, "error": str(e)}
+                else:
+                    # Imported rows already carry ROI metrics
+                    st.session_state.pipeline.seed_roi(result["use_cases"])
+                    st.session_state.use_cases = merge_use_cases(st.session_state.use_cases, result["use_cases"])
+                    st.session_state.import_report = {
+                        "file": upload.name,
+                        **{key: result[key] for key in ("rows", "imported", "failed", "errors")}
+                    }
+                st.rerun()
+            
+            report = st.session_state.get("import_report")
+            if report and "error" in report:
+                st.error(f"Could not import {report['file']}: {report['error']}")
+            elif report:
+                st.success(f"Imported {report['imported']:,} of {report['rows']:,} rows from {report['file']}")
+                if report["failed"]:
+                    from src.bulk_import import error_report_csv
+                    st.warning(f"{report['failed']:,} row(s) skipped")
+                    st.download_button(
+                        "📄 Download Error Report",
+                        error_report_csv(report["errors"]),
+                        file_name="import_errors.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
+        
+        if st.session_state.use_cases:
+            render_finance_assumptions()
+        
         st.markdown("---")
         
         # Phase controls
-        if len(st.session_state.use_cases) >= 5 and not st.session_state.roi_computed:
+        if len(st.session_state.use_cases) >= 5 and not st.session_state.pipeline.roi_enabled:
+            simulate = st.checkbox(
+                "Monte Carlo risk simulation",
+                key="simulate_risk",
+                help="Sample cost overruns, benefit shortfalls and failures to report P10/P50/P90 NPV"
+            )
             if st.button("💰 Compute ROI", use_container_width=True):
-                st.session_state.use_cases = compute_all_roi(st.session_state.use_cases)
-                st.session_state.roi_computed = True
+                st.session_state.pipeline.enable_roi(simulate=simulate)
+                sync_pipeline()
                 st.session_state.phase = "roi"
                 st.rerun()
         
         if st.session_state.roi_computed and not st.session_state.portfolio:
             budget = st.number_input("Effort Budget", 1, 100, 20, key="budget_input")
+            method = st.radio(
+                "Selection Method",
+                ["optimal", "greedy"],
+                format_func=lambda m: "Exact (knapsack)" if m == "optimal" else "Greedy (fast)",
+                horizontal=True,
+                key="selection_method"
+            )
             if st.button("🎯 Select Portfolio", use_container_width=True):
-                st.session_state.portfolio = select_portfolio(
-                    st.session_state.use_cases,
-                    budget
-                )
-                st.session_state.phase = "portfolio"
+                from src.portfolio_logic import select_portfolio
+                try:
+                    st.session_state.portfolio = select_portfolio(
+                        st.session_state.use_cases,
+                        budget,
+                        method=method,
+                        graph=st.session_state.pipeline.dependency_graph(st.session_state.use_cases)
+                    )
+                except DependencyCycleError as e:
+                    st.session_state.dependency_error = str(e)
+                else:
+                    st.session_state.pipeline.record_portfolio(
+                        st.session_state.use_cases, st.session_state.org_info, st.session_state.portfolio
+                    )
+                    st.session_state.dependency_error = None
+                    st.session_state.phase = "portfolio"
                 st.rerun()
         
         if st.session_state.portfolio and not st.session_state.canvas:
+            from src.canvas_builder import build_canvas, DEFAULT_MAX_PARALLEL
+            st.number_input(
+                "Parallel Initiatives",
+                1, 20, min(DEFAULT_MAX_PARALLEL or 20, 20),
+                key="max_parallel",
+                help="How many initiatives the team can run at once when scheduling the roadmap"
+            )
+            st.checkbox(
+                "Sensitivity analysis",
+                key="include_sensitivity",
+                help="Add a tornado chart to the canvas showing how portfolio value moves when initial cost, benefits, risk probability or effort change"
+            )
             if st.button("🗺️ Generate Canvas", use_container_width=True):
                 org = st.session_state.org_info or {}
-                st.session_state.canvas = build_canvas(
-                    st.session_state.use_cases,
-                    st.session_state.portfolio,
-                    org_name=org.get("organization_name", org.get("name", "")),
-                    org_team=org.get("team_name", org.get("team", "")),
-                    designed_by=org.get("designed_by", ""),
-                    designed_for=org.get("designed_for", ""),
-                    primary_goal=org.get("primary_goal", ""),
-                    strategic_focus=org.get("strategic_focus", "")
-                )
-                st.session_state.phase = "canvas"
+                try:
+                    st.session_state.canvas = build_canvas(
+                        st.session_state.use_cases,
+                        st.session_state.portfolio,
+                        org_name=org.get("organization_name", org.get("name", "")),
+                        org_team=org.get("team_name", org.get("team", "")),
+                        designed_by=org.get("designed_by", ""),
+                        designed_for=org.get("designed_for", ""),
+                        primary_goal=org.get("primary_goal", ""),
+                        strategic_focus=org.get("strategic_focus", ""),
+                        max_parallel=st.session_state.get("max_parallel", DEFAULT_MAX_PARALLEL),
+                        sensitivity=st.session_state.get("include_sensitivity", False),
+                        graph=st.session_state.pipeline.dependency_graph(st.session_state.use_cases)
+                    )
+                except DependencyCycleError as e:
+                    st.session_state.dependency_error = str(e)
+                else:
+                    st.session_state.pipeline.record_data(
+                        st.session_state.use_cases, st.session_state.org_info, st.session_state.portfolio
+                    )
+                    st.session_state.dependency_error = None
+                    st.session_state.phase = "canvas"
                 st.rerun()
         
         st.markdown("---")
         
         if st.button("🔄 Start Over"):
+            # Writes still queued for the old session are dropped, and the
+            # URL no longer names it, so the next rerun starts a new session
+            writer = get_session_writer()
+            if writer:
+                writer.discard(st.session_state.session_id)
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
+            if "session" in st.query_params:
+                del st.query_params["session"]
+            start_session()
+            st.rerun()
+
+
+def render_finance_assumptions():
+    """Sidebar settings for the cash-flow metrics (horizon and discount curve)."""
+    from src.cashflow import DEFAULT_HORIZON_YEARS, DEFAULT_DISCOUNT_RATE, MAX_HORIZON_YEARS
+    pipeline = st.session_state.pipeline
+    current_horizon = pipeline.horizon_years or DEFAULT_HORIZON_YEARS
+    current_discount = DEFAULT_DISCOUNT_RATE if pipeline.discount is None else pipeline.discount
+    current_rates = current_discount if isinstance(current_discount, list) else [current_discount]
+    
+    if "finance_horizon" not in st.session_state:
+        st.session_state.finance_horizon = current_horizon
+        st.session_state.finance_discount = ", ".join(f"{rate * 100:g}" for rate in current_rates)
+    
+    with st.expander("📈 Finance Assumptions"):
+        horizon = st.number_input(
+            "Horizon (years)", 1, MAX_HORIZON_YEARS,
+            key="finance_horizon",
+            help="Years of cash flow for NPV, IRR and payback; years after the first use the long-term figures"
+        )
+        text = st.text_input(
+            "Discount rate (%)",
+            key="finance_discount",
+            help="One rate, or one rate per year separated by commas (e.g. 8, 9, 10); the last rate applies to later years"
+        )
+        st.caption("The specification metrics (NPV 10%, payback years) always use 10% over 3 years")
+        try:
+            rates = [float(part) / 100 for part in text.split(",") if part.strip()]
+        except ValueError:
+            rates = []
+        if not rates or any(rate <= -1 for rate in rates):
+            st.error("Enter one or more discount rates above -100%, separated by commas")
+            return
+        
+        discount = rates[0] if len(rates) == 1 else rates
+        if horizon != current_horizon or rates != current_rates:
+            pipeline.set_finance(horizon, discount)
+            sync_pipeline()
             st.rerun()
 
 
@@ -324,72 +615,114 @@ def render_chat_interface():
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
-            # Clean XML tags from assistant messages before displaying
-            content = message["content"]
-            if message["role"] == "assistant":
-                content = re.sub(r'<USE_CASE_DATA>.*?</USE_CASE_DATA>', '', content, flags=re.DOTALL)
-                content = re.sub(r'<ORG_DATA>.*?</ORG_DATA>', '', content, flags=re.DOTALL)
-                content = re.sub(r'<EFFORT_BUDGET>.*?</EFFORT_BUDGET>', '', content, flags=re.DOTALL)
-                content = re.sub(r'<GENERATE_CANVAS>.*?</GENERATE_CANVAS>', '', content, flags=re.DOTALL)
-            st.markdown(content)
+            # Assistant messages are shown without XML data blocks (cached per message)
+            st.markdown(message_display_text(message))
     
     # Chat input
-    if prompt := st.chat_input("Type your message..."):
+    prompt = st.chat_input("Type your message...")
+    if prompt:
         # Add user message
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
+    
+    # Also resumes a response that a rerun interrupted mid-stream
+    if prompt or st.session_state.get("awaiting_response"):
+        st.session_state.awaiting_response = True
         
-        # Get agent response
+        # Get agent response, streamed into the chat bubble as it arrives
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Prepare messages for API
-                api_messages = [
-                    {"role": m["role"], "content": m["content"]}
-                    for m in st.session_state.messages
-                ]
-                
-                response = call_claude(api_messages, st.session_state.api_key)
-                
-                # Extract any data blocks before displaying
-                extracted = extract_data_blocks(response)
-                
-                # Remove XML data blocks from display text
-                display_text = response
-                display_text = re.sub(r'<USE_CASE_DATA>.*?</USE_CASE_DATA>', '', display_text, flags=re.DOTALL)
-                display_text = re.sub(r'<ORG_DATA>.*?</ORG_DATA>', '', display_text, flags=re.DOTALL)
-                display_text = re.sub(r'<EFFORT_BUDGET>.*?</EFFORT_BUDGET>', '', display_text, flags=re.DOTALL)
-                display_text = re.sub(r'<GENERATE_CANVAS>.*?</GENERATE_CANVAS>', '', display_text, flags=re.DOTALL)
-                
-                st.markdown(display_text)
-        
-        # Add assistant response
-        st.session_state.messages.append({"role": "assistant", "content": response})
+            # Prepare messages for API, compacting older turns if over budget
+            with stage("build_messages"):
+                api_messages = st.session_state.conversation.build_messages(
+                    st.session_state.messages,
+                    use_cases=st.session_state.use_cases,
+                    org_info=st.session_state.org_info
+                )
+            
+            placeholder = st.empty()
+            placeholder.markdown("_Thinking..._")
+            parser = DataBlockParser()
+            chunks = []
+            parse_seconds = 0.0
+            # The latest user message is the last one in the full history
+            turn = len(st.session_state.messages) - 1
+            
+            # call_claude is only the time spent waiting on the stream, not
+            # parsing or rendering the chunks
+            stream = stream_claude(api_messages, st.session_state.api_key, turn)
+            network_seconds = 0.0
+            try:
+                while True:
+                    network_started = time.perf_counter()
+                    try:
+                        chunk = next(stream, None)
+                    finally:
+                        network_seconds += time.perf_counter() - network_started
+                    if chunk is None:
+                        break
+                    chunks.append(chunk)
+                    # XML data blocks are hidden and parsed while streaming
+                    parse_started = time.perf_counter()
+                    visible = parser.feed(chunk)
+                    parse_seconds += time.perf_counter() - parse_started
+                    if visible:
+                        placeholder.markdown(parser.display_text + "▌")
+            finally:
+                record_stage("call_claude", network_seconds)
+            
+            parse_started = time.perf_counter()
+            parser.close()
+            record_stage("extract_data_blocks", parse_seconds + time.perf_counter() - parse_started)
+            placeholder.markdown(parser.display_text)
+            response = "".join(chunks)
+            extracted = parser.result()
+        
+        st.session_state.awaiting_response = False
+        
+        # Add assistant response, keeping the cleaned text for later reruns
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": response,
+            "display_content": parser.display_text
+        })
+        
+        if extracted['errors']:
+            st.session_state.data_block_errors = (
+                st.session_state.get("data_block_errors", []) + extracted['errors']
+            )
         
         if extracted['use_cases']:
-            st.session_state.use_cases.extend(extracted['use_cases'])
+            # A use case with a known id is an edit of that use case
+            st.session_state.use_cases = merge_use_cases(st.session_state.use_cases, extracted['use_cases'])
         
         if extracted['org_data']:
             st.session_state.org_info = extracted['org_data']
         
+        if extracted['effort_budget'] or extracted['generate_canvas']:
+            from src.portfolio_logic import select_portfolio
+            from src.canvas_builder import build_canvas, DEFAULT_MAX_PARALLEL
+            # Score any new or edited use cases first
+            st.session_state.pipeline.enable_roi()
+        
+        sync_pipeline()
+        
         if extracted['effort_budget']:
-            # Compute ROI first if not already done
-            if not st.session_state.roi_computed:
-                st.session_state.use_cases = compute_all_roi(st.session_state.use_cases)
-                st.session_state.roi_computed = True
-            
             budget = extracted['effort_budget']['budget']
-            st.session_state.portfolio = select_portfolio(
-                st.session_state.use_cases,
-                budget
-            )
+            try:
+                st.session_state.portfolio = select_portfolio(
+                    st.session_state.use_cases,
+                    budget,
+                    graph=st.session_state.pipeline.dependency_graph(st.session_state.use_cases)
+                )
+                st.session_state.pipeline.record_portfolio(
+                    st.session_state.use_cases, st.session_state.org_info, st.session_state.portfolio
+                )
+                st.session_state.dependency_error = None
+            except DependencyCycleError as e:
+                st.session_state.dependency_error = str(e)
         
         if extracted['generate_canvas']:
-            # Ensure ROI is computed before generating canvas
-            if not st.session_state.roi_computed:
-                st.session_state.use_cases = compute_all_roi(st.session_state.use_cases)
-                st.session_state.roi_computed = True
-            
             # Ensure portfolio is selected before generating canvas
             if not st.session_state.portfolio:
                 st.error("Portfolio must be selected before generating canvas")
@@ -397,17 +730,29 @@ def render_chat_interface():
                 return
             
             org = st.session_state.org_info or {}
-            st.session_state.canvas = build_canvas(
-                st.session_state.use_cases,
-                st.session_state.portfolio,
-                org_name=org.get("organization_name", org.get("name", "")),
-                org_team=org.get("team_name", org.get("team", "")),
-                designed_by=org.get("designed_by", ""),
-                designed_for=org.get("designed_for", ""),
-                primary_goal=org.get("primary_goal", ""),
-                strategic_focus=org.get("strategic_focus", "")
-            )
+            try:
+                st.session_state.canvas = build_canvas(
+                    st.session_state.use_cases,
+                    st.session_state.portfolio,
+                    org_name=org.get("organization_name", org.get("name", "")),
+                    org_team=org.get("team_name", org.get("team", "")),
+                    designed_by=org.get("designed_by", ""),
+                    designed_for=org.get("designed_for", ""),
+                    primary_goal=org.get("primary_goal", ""),
+                    strategic_focus=org.get("strategic_focus", ""),
+                    max_parallel=st.session_state.get("max_parallel", DEFAULT_MAX_PARALLEL),
+                    sensitivity=st.session_state.get("include_sensitivity", False),
+                    graph=st.session_state.pipeline.dependency_graph(st.session_state.use_cases)
+                )
+                st.session_state.pipeline.record_data(
+                    st.session_state.use_cases, st.session_state.org_info, st.session_state.portfolio
+                )
+                st.session_state.dependency_error = None
+            except DependencyCycleError as e:
+                st.session_state.dependency_error = str(e)
         
+        # Save the reply now rather than after the rerun
+        persist_session()
         st.rerun()
     
     # Initial greeting if no messages
@@ -447,6 +792,104 @@ Once you have a key, I can guide you through an intelligent interview process!""
             })
 
 
+# Use cases listed individually in the Use Cases tab (bulk imports can be large)
+USE_CASE_LIST_LIMIT = 200
+
+# Largest budget on the frontier; matches the sidebar Effort Budget input
+FRONTIER_MAX_BUDGET = 100
+
+
+def get_budget_frontier():
+    """
+    Totals and selections for every budget, computed once per set of use
+    cases and selection method and kept in session_state.
+    """
+    from src.portfolio_logic import portfolio_frontier
+    
+    use_cases = st.session_state.use_cases
+    method = st.session_state.get("selection_method", "optimal")
+    total_effort = sum(int(uc.get("effort_score_1_to_10", 0) or 0) for uc in use_cases)
+    max_budget = max(1, min(FRONTIER_MAX_BUDGET, total_effort))
+    key = canvas_key({
+        "use_cases": st.session_state.pipeline.use_cases_key(use_cases),
+        "max_budget": max_budget,
+        "method": method
+    })
+    
+    cached = st.session_state.get("frontier")
+    if cached is None or cached["key"] != key:
+        graph = st.session_state.pipeline.dependency_graph(use_cases)
+        cached = {"key": key, "frontier": portfolio_frontier(use_cases, max_budget, method, graph=graph)}
+        st.session_state.frontier = cached
+    return cached["frontier"]
+
+
+def get_portfolio_risk(portfolio):
+    """
+    Monte Carlo NPV percentiles for the selected use cases taken together,
+    computed once per selection and kept in session_state.
+    """
+    from src.roi_calculations import roi_input_hash
+    from src.risk_simulation import simulate_risk
+    
+    selected = portfolio["selected_use_cases"]
+    key = [roi_input_hash(uc) for uc in selected]
+    cached = st.session_state.get("portfolio_risk")
+    if cached is None or cached["key"] != key:
+        cached = {"key": key, "risk": simulate_risk(selected, per_use_case=False)["portfolio"]}
+        st.session_state.portfolio_risk = cached
+    return cached["risk"]
+
+
+def render_budget_frontier():
+    """Impact/effort/NPV frontier; clicking a point switches to that budget's portfolio."""
+    import altair as alt
+    
+    try:
+        frontier = get_budget_frontier()
+    except DependencyCycleError:
+        st.caption("The budget frontier is unavailable until the dependency cycle is fixed.")
+        return
+    
+    points = frontier["points"]
+    pick = alt.selection_point(fields=["budget"], name="pick", on="click")
+    base = alt.Chart(alt.Data(values=points)).encode(
+        x=alt.X("budget:Q", title="Effort Budget"),
+        y=alt.Y("total_impact:Q", title="Total Impact Score")
+    )
+    chart = base.mark_line(interpolate="step-after", opacity=0.4) + base.mark_circle(size=80).encode(
+        color=alt.condition("datum.pareto", alt.value("#1f77b4"), alt.value("#bbbbbb")),
+        tooltip=[
+            alt.Tooltip("budget:Q", title="Budget"),
+            alt.Tooltip("total_impact:Q", title="Impact"),
+            alt.Tooltip("total_effort:Q", title="Effort Used"),
+            alt.Tooltip("total_npv:Q", title="NPV", format="$,.0f"),
+            alt.Tooltip("use_case_count:Q", title="Use Cases")
+        ]
+    ).add_params(pick)
+    
+    st.markdown("**Budget Frontier**")
+    st.caption("Best portfolio at every effort budget. Click a point to select that budget's portfolio.")
+    event = st.altair_chart(chart, use_container_width=True, on_select="rerun", key="frontier_chart")
+    
+    # The chart keeps its selection across reruns, so only a new click is applied
+    picked = (event.selection.get("pick") or [{}])[0].get("budget") if event else None
+    if picked is not None and picked != st.session_state.get("frontier_pick"):
+        st.session_state.frontier_pick = picked
+        from src.portfolio_logic import frontier_portfolio
+        st.session_state.portfolio = frontier_portfolio(
+            st.session_state.use_cases, frontier, int(picked),
+            graph=st.session_state.pipeline.dependency_graph(st.session_state.use_cases)
+        )
+        st.session_state.pipeline.record_portfolio(
+            st.session_state.use_cases, st.session_state.org_info, st.session_state.portfolio
+        )
+        st.session_state.canvas = None
+        st.session_state.dependency_error = None
+        st.session_state.phase = "portfolio"
+        st.rerun()
+
+
 def render_results_tabs():
     """Render tabs showing current progress and results."""
     if st.session_state.use_cases or st.session_state.roi_computed or st.session_state.portfolio or st.session_state.canvas:
@@ -457,7 +900,7 @@ def render_results_tabs():
             tabs.append("📋 Use Cases")
         if st.session_state.roi_computed:
             tabs.append("💰 ROI Analysis")
-        if st.session_state.portfolio:
+        if st.session_state.roi_computed or st.session_state.portfolio:
             tabs.append("🎯 Portfolio")
         if st.session_state.canvas:
             tabs.append("🗺️ Canvas")
@@ -470,7 +913,9 @@ def render_results_tabs():
             if "📋 Use Cases" in tabs:
                 with tab_objects[tab_idx]:
                     st.subheader(f"Collected Use Cases ({len(st.session_state.use_cases)})")
-                    for uc in st.session_state.use_cases:
+                    if len(st.session_state.use_cases) > USE_CASE_LIST_LIMIT:
+                        st.caption(f"Showing the first {USE_CASE_LIST_LIMIT}")
+                    for uc in st.session_state.use_cases[:USE_CASE_LIST_LIMIT]:
                         with st.expander(f"**{uc.get('id', 'UC')}: {uc.get('title', 'Untitled')}**"):
                             st.write(f"**Problem:** {uc.get('problem', 'N/A')}")
                             st.write(f"**Effort:** {uc.get('effort_score_1_to_10', 'N/A')}/10")
@@ -485,6 +930,9 @@ def render_results_tabs():
             if "💰 ROI Analysis" in tabs:
                 with tab_objects[tab_idx]:
                     st.subheader("ROI Analysis Results")
+                    from src.cashflow import DEFAULT_HORIZON_YEARS
+                    custom_finance = bool(st.session_state.pipeline.finance())
+                    npv_label = f"NPV ({st.session_state.pipeline.horizon_years or DEFAULT_HORIZON_YEARS}y)"
                     df_data = []
                     for uc in st.session_state.use_cases:
                         df_data.append({
@@ -493,30 +941,55 @@ def render_results_tabs():
                             "Long-term ROI": f"{uc.get('long_term_roi_percent', 0):.1f}%",
                             "NPV": f"${uc.get('npv_10_percent', 0):,.0f}",
                             "Payback": uc.get('payback_period_years', 'N/A'),
-                            "Risk-Adj Value": f"${uc.get('risk_adjusted_value', 0):,.0f}"
+                            "Risk-Adj Value": f"${uc.get('risk_adjusted_value', 0):,.0f}",
+                            "IRR": "N/A" if uc.get("irr_percent") is None else f"{uc['irr_percent']:.1f}%",
+                            "Payback (months)": "N/A" if uc.get("payback_months") is None else f"{uc['payback_months']:.1f}"
                         })
+                        if custom_finance:
+                            df_data[-1][npv_label] = f"${uc.get('npv_horizon', 0):,.0f}"
+                        if "npv_p50" in uc:
+                            df_data[-1].update({
+                                "NPV P10": f"${uc['npv_p10']:,.0f}",
+                                "NPV P50": f"${uc['npv_p50']:,.0f}",
+                                "NPV P90": f"${uc['npv_p90']:,.0f}",
+                                "Payback ≤ 3y": f"{uc['payback_3y_probability']:.0%}"
+                            })
+                    import pandas as pd
                     st.dataframe(pd.DataFrame(df_data), use_container_width=True, hide_index=True)
                 tab_idx += 1
             
             # Portfolio Tab
             if "🎯 Portfolio" in tabs:
                 with tab_objects[tab_idx]:
-                    st.subheader("Selected Portfolio")
                     portfolio = st.session_state.portfolio
                     
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Selected", len(portfolio["selected_use_cases"]))
-                    with col2:
-                        st.metric("Total Effort", portfolio["total_effort"])
-                    with col3:
-                        st.metric("Budget", portfolio["effort_budget"])
-                    
-                    st.info(portfolio["selection_rationale"])
+                    if portfolio:
+                        st.subheader("Selected Portfolio")
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Selected", len(portfolio["selected_use_cases"]))
+                        with col2:
+                            st.metric("Total Effort", portfolio["total_effort"])
+                        with col3:
+                            st.metric("Budget", portfolio["effort_budget"])
+                        
+                        st.info(portfolio["selection_rationale"])
+                        
+                        if st.session_state.pipeline.simulate and portfolio["selected_use_cases"]:
+                            risk = get_portfolio_risk(portfolio)
+                            st.markdown("**Portfolio NPV (Monte Carlo):**")
+                            col1, col2, col3, col4 = st.columns(4)
+                            col1.metric("P10", f"${risk['npv_p10']:,.0f}")
+                            col2.metric("P50", f"${risk['npv_p50']:,.0f}")
+                            col3.metric("P90", f"${risk['npv_p90']:,.0f}")
+                            col4.metric("Payback ≤ 3y", f"{risk['payback_3y_probability']:.0%}")
+                        
+                        st.markdown("**Selected Use Cases:**")
+                        for uc in portfolio["selected_use_cases"]:
+                            st.write(f"✅ {uc.get('title', 'Untitled')} ({uc.get('category', 'N/A')}) - Effort: {uc.get('effort_score_1_to_10', 'N/A')}")
                     
-                    st.markdown("**Selected Use Cases:**")
-                    for uc in portfolio["selected_use_cases"]:
-                        st.write(f"✅ {uc.get('title', 'Untitled')} ({uc.get('category', 'N/A')}) - Effort: {uc.get('effort_score_1_to_10', 'N/A')}")
+                    if st.session_state.roi_computed and st.session_state.use_cases:
+                        render_budget_frontier()
                 tab_idx += 1
             
             # Canvas Tab
@@ -525,6 +998,8 @@ def render_results_tabs():
                     st.subheader("AI ROI & Roadmap Canvas")
                     
                     canvas = st.session_state.canvas
+                    render_cache = get_render_cache()
+                    render_key = canvas_key(canvas)
                     
                     # View options
                     view_mode = st.radio(
@@ -540,7 +1015,7 @@ def render_results_tabs():
                         st.markdown("### Professional Canvas Layout")
                         st.caption("This matches the format from your reference image")
                         
-                        visual_html = generate_visual_canvas_html(canvas)
+                        visual_html = render_cache.html(canvas, render_key)
                         
                         # Display in iframe
                         st.components.v1.html(visual_html, height=1200, scrolling=True)
@@ -570,7 +1045,7 @@ def render_results_tabs():
                                 use_container_width=True
                             )
                         with col3:
-                            markdown_content = canvas_to_markdown(canvas)
+                            markdown_content = render_cache.markdown(canvas, render_key)
                             st.download_button(
                                 "📝 Download as Markdown",
                                 data=markdown_content,
@@ -579,9 +1054,19 @@ def render_results_tabs():
                                 use_container_width=True
                             )
                         with col4:
-                            if st.button("📸 Generate PNG", use_container_width=True, key="png_gen"):
+                            png_bytes = render_cache.cached_png(canvas, render_key)
+                            if png_bytes:
+                                st.download_button(
+                                    "📸 Download as PNG",
+                                    data=png_bytes,
+                                    file_name=f"ai_canvas_{datetime.now().strftime('%Y%m%d')}.png",
+                                    mime="image/png",
+                                    use_container_width=True,
+                                    key="png_download"
+                                )
+                            elif st.button("📸 Generate PNG", use_container_width=True, key="png_gen"):
                                 with st.spinner("Converting canvas to PNG..."):
-                                    png_bytes = get_png_bytes(visual_html)
+                                    png_bytes = render_cache.png(canvas, render_key)
                                     if png_bytes:
                                         st.download_button(
                                             "📸 Download as PNG",
@@ -617,6 +1102,7 @@ def render_results_tabs():
                                 phases_str = ', '.join([p.get('name', 'Unknown') for p in item_copy['Phases']])
                                 item_copy['Phases'] = phases_str
                             timeline_data.append(item_copy)
+                        import pandas as pd
                         timeline_df = pd.DataFrame(timeline_data)
                         st.dataframe(timeline_df, use_container_width=True, hide_index=True)
                     
@@ -626,13 +1112,15 @@ def render_results_tabs():
                     
                     elif view_mode == "📝 Markdown":
                         # Markdown view
-                        md_str = canvas_to_markdown(canvas)
+                        md_str = render_cache.markdown(canvas, render_key)
                         st.markdown(md_str)
 
 
 def main():
     """Main application entry point."""
     initialize_session_state()
+    set_session(st.session_state.session_id)
+    sync_pipeline()
     
     # Render sidebar
     render_sidebar()
@@ -642,6 +1130,8 @@ def main():
     
     # Render results tabs
     render_results_tabs()
+    
+    persist_session()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,13 @@
+"""
+Benchmarks for the ROI → portfolio → canvas pipeline.
+
+Usage:
+    python -m benchmarks [--sizes 10 1000 100000] [-o results.json]
+    python -m benchmarks --baseline baseline.json [--threshold 0.2]
+
+- synthetic: reproducible use-case sets shaped like USE_CASE_DATA
+- pipeline: stage timings, JSON results and baseline comparison
+"""
+
+from benchmarks.synthetic import generate_use_cases, generate_org_info
+from benchmarks.pipeline import run_benchmarks, compare_results, STAGES
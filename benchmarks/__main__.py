@@ -0,0 +1,81 @@
+"""
+Command line entry point: python -m benchmarks --help
+"""
+
+import sys
+import json
+import argparse
+
+from src.file_utils import atomic_write
+
+from benchmarks.pipeline import (
+    DEFAULT_SIZES, DEFAULT_REPEAT, DEFAULT_THRESHOLD, STAGES,
+    run_benchmarks, compare_results, load_results
+)
+from benchmarks.synthetic import DEFAULT_SEED
+
+
+def _format_seconds(seconds) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time the ROI → portfolio → canvas pipeline on synthetic use cases."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="use-case counts to benchmark")
+    parser.add_argument("--stages", nargs="+", choices=[name for name, _ in STAGES], help="only these stages")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="synthetic data seed")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed samples per stage")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative slowdown flagged as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    def progress(row):
+        print(
+            f"  {row['stage']:<28} n={row['size']:<8} "
+            f"best {_format_seconds(row['min_s']):>10}  median {_format_seconds(row['median_s']):>10}"
+        )
+
+    print(f"Benchmarking sizes {', '.join(str(n) for n in args.sizes)} (seed {args.seed})")
+    results = run_benchmarks(args.sizes, args.seed, args.repeat, args.stages, progress)
+
+    if args.output:
+        atomic_write(args.output, json.dumps(results, indent=2))
+        print(f"\n✓ Saved results to: {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    rows = compare_results(results, load_results(args.baseline), args.threshold)
+    marks = {"regression": "✗", "faster": "✓", "ok": " ", "new": "+"}
+    print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+        print(
+            f"{marks[row['status']]} {row['stage']:<28} n={row['size']:<8} "
+            f"{_format_seconds(row['baseline_s']):>10} → {_format_seconds(row['current_s']):>10}  {ratio:>7}  {row['status']}"
+        )
+
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s)")
+        return 1
+    print("\n✓ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
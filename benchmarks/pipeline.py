@@ -0,0 +1,177 @@
+"""
+Stage timings for the ROI → portfolio → canvas → export pipeline.
+
+Each stage's input is prepared once, untimed, from the previous stage's
+output; only the stage call itself is measured. Timing uses timeit with
+the garbage collector disabled: the loop count is calibrated so one sample
+takes at least 0.2s, and the best of `repeat` samples is reported next to
+the median.
+"""
+
+import sys
+import json
+import time
+import timeit
+import platform
+import statistics
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from src.roi_calculations import compute_all_roi
+from src.portfolio_logic import select_portfolio
+from src.risk_simulation import simulate_risk
+from src.canvas_builder import build_canvas, canvas_to_markdown
+from src.visual_canvas import generate_visual_canvas_html
+from src.export_canvas import export_to_json
+
+from benchmarks.synthetic import DEFAULT_SEED, generate_use_cases, generate_org_info
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+DEFAULT_REPEAT = 5
+# Effort budget = items × this, so large portfolios (and canvases) scale with n,
+# capped because at the default team capacity a roadmap of tens of thousands
+# of initiatives runs past datetime.max
+EFFORT_BUDGET_PER_ITEM = 3
+MAX_EFFORT_BUDGET = 3_000
+# The risk simulation runs on a portfolio of at most this many use cases
+# (DEFAULT_DRAWS draws each), the size the app simulates; target < 1s
+SIMULATION_USE_CASES = 100
+DEFAULT_THRESHOLD = 0.2
+# Differences below this are timer noise, never regressions
+MIN_DELTA_SECONDS = 0.0005
+
+
+def _build(use_cases: List[Dict[str, Any]], portfolio: Dict[str, Any]) -> Dict[str, Any]:
+    org = generate_org_info()
+    return build_canvas(
+        use_cases,
+        portfolio,
+        org_name=org["organization_name"],
+        org_team=org["team_name"],
+        designed_by=org["designed_by"],
+        designed_for=org["designed_for"],
+        primary_goal=org["primary_goal"],
+        strategic_focus=org["strategic_focus"]
+    )
+
+
+# (stage, callable taking the prepared pipeline state)
+STAGES: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = [
+    ("compute_all_roi", lambda state: compute_all_roi(state["raw"])),
+    ("select_portfolio", lambda state: select_portfolio(state["use_cases"], state["budget"])),
+    ("simulate_risk", lambda state: simulate_risk(state["use_cases"][:SIMULATION_USE_CASES])),
+    ("build_canvas", lambda state: _build(state["use_cases"], state["portfolio"])),
+    ("generate_visual_canvas_html", lambda state: generate_visual_canvas_html(state["canvas"])),
+    ("canvas_to_markdown", lambda state: canvas_to_markdown(state["canvas"])),
+    ("export_to_json", lambda state: export_to_json(state["canvas"])),
+]
+
+
+def prepare_state(n: int, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """Run the pipeline once, untimed, to produce every stage's input."""
+    raw = generate_use_cases(n, seed)
+    use_cases = compute_all_roi(raw)
+    budget = min(EFFORT_BUDGET_PER_ITEM * n, MAX_EFFORT_BUDGET)
+    portfolio = select_portfolio(use_cases, budget)
+    return {
+        "raw": raw,
+        "use_cases": use_cases,
+        "budget": budget,
+        "portfolio": portfolio,
+        "canvas": _build(use_cases, portfolio)
+    }
+
+
+def time_stage(fn: Callable[[], Any], repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """Best and median seconds per call over `repeat` calibrated samples."""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    samples = [total / loops for total in timer.repeat(repeat=max(1, repeat), number=loops)]
+    return {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "loops": loops,
+        "samples": len(samples)
+    }
+
+
+def run_benchmarks(
+    sizes=DEFAULT_SIZES,
+    seed: int = DEFAULT_SEED,
+    repeat: int = DEFAULT_REPEAT,
+    stages: Optional[List[str]] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Time every stage at every size.
+
+    Returns {"meta": {...}, "results": [{"stage", "size", "min_s",
+    "median_s", "loops", "samples", "items_per_s"}, ...]}.
+    """
+    selected = [(name, fn) for name, fn in STAGES if stages is None or name in stages]
+    results = []
+    for n in sizes:
+        state = prepare_state(n, seed)
+        for name, fn in selected:
+            row = {"stage": name, "size": n, **time_stage(lambda: fn(state), repeat)}
+            row["items_per_s"] = n / row["min_s"] if row["min_s"] else None
+            if name == "select_portfolio":
+                row["effort_budget"] = state["budget"]
+                row["selection_method"] = state["portfolio"].get("selection_method")
+            results.append(row)
+            if progress:
+                progress(row)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "effort_budget_per_item": EFFORT_BUDGET_PER_ITEM,
+            "max_effort_budget": MAX_EFFORT_BUDGET,
+            "simulation_use_cases": SIMULATION_USE_CASES
+        },
+        "results": results
+    }
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_seconds: float = MIN_DELTA_SECONDS
+) -> List[Dict[str, Any]]:
+    """
+    Compare best times per (stage, size) against a baseline run.
+
+    Status per row:
+    - "regression": slower by more than threshold (and min_delta_seconds)
+    - "faster": quicker by more than threshold
+    - "ok": within threshold
+    - "new": not in the baseline
+    """
+    base = {(row["stage"], row["size"]): row for row in baseline.get("results", [])}
+    rows = []
+    for row in current["results"]:
+        previous = base.get((row["stage"], row["size"]))
+        entry = {"stage": row["stage"], "size": row["size"], "current_s": row["min_s"]}
+        if previous is None:
+            entry.update(baseline_s=None, ratio=None, status="new")
+        else:
+            ratio = row["min_s"] / previous["min_s"] if previous["min_s"] else float("inf")
+            delta = row["min_s"] - previous["min_s"]
+            if ratio > 1 + threshold and delta > min_delta_seconds:
+                status = "regression"
+            elif ratio < 1 - threshold and -delta > min_delta_seconds:
+                status = "faster"
+            else:
+                status = "ok"
+            entry.update(baseline_s=previous["min_s"], ratio=ratio, status=status)
+        rows.append(entry)
+    return rows
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return json.load(f)
@@ -0,0 +1,91 @@
+"""
+Synthetic use cases shaped like the agent's USE_CASE_DATA blocks
+(see the schema in src/agent_prompt.py).
+
+The same (n, seed) always yields the same data, so timings from different
+commits or machines run on identical inputs.
+"""
+
+import random
+from typing import Dict, Any, List
+
+DEFAULT_SEED = 1234
+
+_DOMAINS = [
+    "Invoice Processing", "Customer Support", "Demand Forecasting", "Fraud Detection",
+    "Document Review", "Sales Lead Scoring", "Supply Chain Routing", "Quality Inspection",
+    "Contract Analysis", "Churn Prediction", "Claims Triage", "Knowledge Search"
+]
+_APPROACHES = ["Automation", "Copilot", "Assistant", "Optimizer", "Classifier", "Insights"]
+_KPIS = [
+    "Cycle time", "Cost per transaction", "First-contact resolution", "Forecast accuracy",
+    "Error rate", "Revenue per rep", "On-time delivery", "Customer satisfaction"
+]
+_SOFT_BENEFITS = [
+    ("Employee satisfaction", "Less repetitive work for the operations team"),
+    ("Better decisions", "Managers see reliable numbers earlier"),
+    ("Customer trust", "Faster, more consistent responses"),
+    ("Scalability", "Volume growth without proportional hiring"),
+    ("Compliance", "Auditable, repeatable process")
+]
+_RISKS = [
+    "Data quality", "Legacy integration", "User adoption", "Model drift",
+    "Regulatory review", "Vendor lock-in", "Skills gap", "Change resistance"
+]
+
+
+def generate_use_case(index: int, rng: random.Random) -> Dict[str, Any]:
+    """One USE_CASE_DATA-shaped dict with plausible, internally consistent numbers."""
+    effort = rng.randint(1, 10)
+    near_term_benefit = rng.randrange(50_000, 1_500_000, 5_000)
+    initial_cost = rng.randrange(20_000, 800_000, 5_000)
+    near_term_cost = rng.randrange(5_000, 150_000, 1_000)
+    domain = rng.choice(_DOMAINS)
+    return {
+        "id": f"UC{index + 1:03d}",
+        "title": f"{domain} {rng.choice(_APPROACHES)} #{index + 1}",
+        "problem": f"Manual {domain.lower()} is slow and error-prone",
+        "kpis": rng.sample(_KPIS, 2),
+        "expected_benefits": {
+            "near_term_annual_benefit": near_term_benefit,
+            "near_term_benefit_breakdown": f"Breakdown: {rng.randint(1, 8)} FTE × $75K + process savings",
+            "long_term_annual_benefit": int(near_term_benefit * rng.uniform(1.0, 2.0)),
+            "soft_benefits": [
+                {"benefit": benefit, "context": context}
+                for benefit, context in rng.sample(_SOFT_BENEFITS, 2)
+            ]
+        },
+        "costs": {
+            "initial_cost": initial_cost,
+            "initial_cost_breakdown": "Development + Integration + Training + Data",
+            "near_term_annual_cost": near_term_cost,
+            "near_term_annual_cost_breakdown": "Maintenance + Change mgmt + Monitoring",
+            "long_term_annual_cost": int(near_term_cost * rng.uniform(0.7, 1.0))
+        },
+        "effort_score_1_to_10": effort,
+        "effort_justification": f"Effort {effort}/10 from integration scope",
+        "risk": {
+            "probability_0_to_1": round(rng.uniform(0.05, 0.6), 2),
+            "impact_0_to_1": round(rng.uniform(0.1, 0.7), 2),
+            "risks_list": rng.sample(_RISKS, 2)
+        },
+        "dependencies": []
+    }
+
+
+def generate_use_cases(n: int, seed: int = DEFAULT_SEED) -> List[Dict[str, Any]]:
+    """n synthetic use cases with unique ids and titles."""
+    rng = random.Random(seed)
+    return [generate_use_case(i, rng) for i in range(n)]
+
+
+def generate_org_info() -> Dict[str, Any]:
+    """ORG_DATA-shaped organization details for build_canvas."""
+    return {
+        "organization_name": "Benchmark Corp",
+        "team_name": "Operations Excellence",
+        "designed_by": "Benchmark Suite",
+        "designed_for": "Executive Committee",
+        "primary_goal": "Reduce operating cost with AI",
+        "strategic_focus": "Operational Efficiency"
+    }
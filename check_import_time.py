@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup Import-Time Check
+
+Usage:
+    python check_import_time.py [--budget-ms 50] [--runs 3] [--top 15]
+
+Runs app.py in Streamlit's bare mode under `python -X importtime` and reports
+what the first script run imports. Fails (exit 1) when:
+- a heavy module that should load lazily is imported at startup
+- the app's own modules (src.* and everything they pull in) take longer to
+  import than the budget (best of --runs)
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+from src.env_settings import env_float
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Milliseconds allowed for importing src.* at startup
+DEFAULT_BUDGET_MS = env_float("IMPORT_TIME_BUDGET_MS", 50.0, minimum=0)
+
+# Loaded only when their tab or action is first used
+LAZY_MODULES = (
+    "pandas",
+    "numpy",
+    "anthropic",
+    "selenium",
+    "pyppeteer",
+    "src.agent_prompt",
+    "src.visual_canvas",
+    "src.png_export",
+)
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self_us, cumulative_us) for every importtime line."""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure_startup() -> List[Tuple[str, int, int, int]]:
+    """Import timings for one cold run of app.py in a fresh interpreter."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", APP_PATH],
+        cwd=os.path.dirname(APP_PATH),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise RuntimeError(f"app.py exited with status {result.returncode}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(entries: List[Tuple[str, int, int, int]]) -> Dict[str, object]:
+    """
+    Totals from the top-level entries:
+    - interpreter: everything imported before streamlit (site, encodings, ...)
+    - app: src.* modules, including the third-party modules they load
+    - streamlit: the rest, i.e. Streamlit and the modules it loads while running
+    """
+    top_level = [(module, cumulative) for module, depth, _, cumulative in entries if depth == 0]
+    first_streamlit = next((i for i, (module, _) in enumerate(top_level) if module == "streamlit"), 0)
+    interpreter_us = sum(cumulative for _, cumulative in top_level[:first_streamlit])
+    top_level = top_level[first_streamlit:]
+    total_us = sum(cumulative for _, cumulative in top_level)
+    app_us = sum(cumulative for module, cumulative in top_level if module.split(".")[0] == "src")
+    loaded = {module for module, _, _, _ in entries}
+    return {
+        "interpreter_ms": interpreter_us / 1000,
+        "streamlit_ms": (total_us - app_us) / 1000,
+        "app_ms": app_us / 1000,
+        "top_level": sorted(top_level, key=lambda item: item[1], reverse=True),
+        "lazy_loaded": [m for m in LAZY_MODULES if m in loaded or any(l.startswith(m + ".") for l in loaded)]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check app.py startup import time against a budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="allowed import time for src.* modules")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreter runs; the fastest counts")
+    parser.add_argument("--top", type=int, default=15, help="heaviest top-level imports to list")
+    args = parser.parse_args(argv)
+
+    summaries = [summarize(measure_startup()) for _ in range(max(1, args.runs))]
+    best = min(summaries, key=lambda summary: summary["app_ms"])
+
+    print(f"Startup imports (best of {len(summaries)}):")
+    print(f"  interpreter {best['interpreter_ms']:8.1f} ms")
+    print(f"  streamlit   {best['streamlit_ms']:8.1f} ms")
+    print(f"  app (src.*) {best['app_ms']:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print("\nHeaviest top-level imports:")
+    for module, cumulative in best["top_level"][:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    status = 0
+    if best["lazy_loaded"]:
+        print(f"\n✗ Loaded at startup but should be lazy: {', '.join(best['lazy_loaded'])}")
+        status = 1
+    if best["app_ms"] > args.budget_ms:
+        print(f"\n✗ Import time {best['app_ms']:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        status = 1
+    if status == 0:
+        print("\n✓ Startup import time within budget")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,32 +4,323 @@ Standalone Visual Canvas Generator
 
 Usage:
     python generate_visual_canvas.py canvas.json output.html
+    python generate_visual_canvas.py canvases/ more/*.json [-o out_dir] [-j 8]
+    python generate_visual_canvas.py --jsonl canvases.jsonl -o out_dir
+    python generate_visual_canvas.py canvases/ --watch [-o out_dir]
 
-Reads a canvas JSON file and generates a beautiful visual HTML representation.
+Reads canvas JSON files and generates beautiful visual HTML representations.
+Batch mode accepts files, directories (every *.json inside) and glob patterns,
+or a JSONL stream with one canvas per line ("-" for stdin), and renders them
+across a process pool. Watch mode polls the inputs and re-renders a canvas
+only when its content hash changes.
 """
 
-import json
+import os
 import sys
+import glob
+import json
+import math
+import time
+import hashlib
+import argparse
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.file_utils import atomic_write
 from src.visual_canvas import generate_visual_canvas_html
 
+WATCH_INTERVAL_SECONDS = 0.5
+WATCH_DEBOUNCE_SECONDS = 0.3
+# Rendered HTML kept per content hash, so reverting an edit is free
+WATCH_CACHE_ENTRIES = 256
+# Batch tasks in flight per worker; inputs are read only as far ahead as this
+TASKS_PER_WORKER = 4
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python generate_visual_canvas.py <canvas.json> [output.html]")
-        print("\nExample:")
-        print("  python generate_visual_canvas.py my_canvas.json")
-        print("  python generate_visual_canvas.py my_canvas.json visual_canvas.html")
-        sys.exit(1)
-    
-    input_file = Path(sys.argv[1])
-    
-    # Determine output file
-    if len(sys.argv) >= 3:
-        output_file = Path(sys.argv[2])
+
+def default_output_path(input_file: Path, output_dir: Optional[Path] = None) -> Path:
+    """<stem>_visual.html next to the input, or inside output_dir."""
+    output_file = input_file.with_stem(f"{input_file.stem}_visual").with_suffix(".html")
+    return output_dir / output_file.name if output_dir else output_file
+
+
+def expand_inputs(patterns: List[str]) -> List[Path]:
+    """Resolve files, directories and glob patterns to canvas JSON files."""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.glob("*.json"))
+        elif path.exists():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+            if not matches:
+                # Reported as a failure by the renderer
+                matches = [path]
+        for match in matches:
+            if match not in seen:
+                seen.add(match)
+                files.append(match)
+    return files
+
+
+def output_collisions(outputs: Dict[Path, Path]) -> Dict[Path, List[Path]]:
+    """Output paths claimed by more than one input (e.g. a/x.json and b/x.json with -o)."""
+    claims: Dict[Path, List[Path]] = {}
+    for input_file, output_file in outputs.items():
+        claims.setdefault(Path(os.path.abspath(output_file)), []).append(input_file)
+    return {output_file: inputs for output_file, inputs in claims.items() if len(inputs) > 1}
+
+
+def report_collisions(collisions: Dict[Path, List[Path]]):
+    for output_file, inputs in collisions.items():
+        print(f"✗ {', '.join(map(str, inputs))} would all be written to {output_file}")
+
+
+def render_file(task: Tuple[str, str]) -> Tuple[str, float, Optional[str]]:
+    """Render one canvas file; returns (input, seconds, error or None)."""
+    input_file, output_file = task
+    started = time.perf_counter()
+    try:
+        with open(input_file, 'r') as f:
+            canvas_data = json.load(f)
+        atomic_write(output_file, generate_visual_canvas_html(canvas_data))
+    except FileNotFoundError:
+        return input_file, time.perf_counter() - started, "File not found"
+    except json.JSONDecodeError as e:
+        return input_file, time.perf_counter() - started, f"Invalid JSON: {e}"
+    except Exception as e:
+        return input_file, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+    return input_file, time.perf_counter() - started, None
+
+
+def render_record(task: Tuple[str, str, str]) -> Tuple[str, float, Optional[str]]:
+    """Render one JSONL record; returns (label, seconds, error or None)."""
+    label, line, output_file = task
+    started = time.perf_counter()
+    try:
+        canvas_data = json.loads(line)
+        atomic_write(output_file, generate_visual_canvas_html(canvas_data))
+    except json.JSONDecodeError as e:
+        return label, time.perf_counter() - started, f"Invalid JSON: {e}"
+    except Exception as e:
+        return label, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+    return label, time.perf_counter() - started, None
+
+
+def iter_jsonl_tasks(source: str, output_dir: Path) -> Iterator[Tuple[str, str, str]]:
+    """One render task per non-blank line of a JSONL file or stdin."""
+    stream = sys.stdin if source == "-" else open(source, 'r')
+    try:
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                yield f"{source}:{line_no}", line, str(output_dir / f"canvas_{line_no:05d}_visual.html")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def bounded_map(executor: ProcessPoolExecutor, worker, tasks, window: int) -> Iterator:
+    """
+    executor.map that keeps at most `window` tasks submitted, so a long
+    task stream (e.g. JSONL on stdin) is consumed as results come back
+    rather than read in full up front. Results are yielded in order.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(worker, task))
+    while pending:
+        yield pending.popleft().result()
+
+
+def run_batch(worker, tasks, jobs: int) -> int:
+    """Render tasks across a process pool and print a throughput summary."""
+    started = time.perf_counter()
+    durations = []
+    failures = []
+
+    if jobs <= 1:
+        results = map(worker, tasks)
+        executor = None
     else:
-        output_file = input_file.with_stem(f"{input_file.stem}_visual").with_suffix(".html")
-    
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = bounded_map(executor, worker, tasks, jobs * TASKS_PER_WORKER)
+
+    try:
+        for label, seconds, error in results:
+            durations.append(seconds)
+            if error:
+                failures.append(label)
+                print(f"✗ {label}: {error}")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    total = len(durations)
+    if not total:
+        print("✗ No canvases found")
+        return 1
+
+    ordered = sorted(durations)
+    p95 = ordered[max(0, math.ceil(0.95 * total) - 1)]
+    print(
+        f"\n✓ Rendered {total - len(failures)}/{total} canvases in {elapsed:.2f}s "
+        f"({total / elapsed if elapsed else float('inf'):.1f} files/s, "
+        f"p95 {p95 * 1000:.1f} ms/file, {jobs} worker{'s' if jobs != 1 else ''})"
+    )
+    if failures:
+        print(f"✗ {len(failures)} failed")
+        return 1
+    return 0
+
+
+class CanvasWatcher:
+    """
+    Polls canvas inputs and re-renders only canvases whose content changed.
+
+    - Directories and glob patterns are re-expanded on every poll, so new
+      files are picked up
+    - A file is rebuilt once its size/mtime has been stable for `debounce`
+      seconds, which skips the half-written states editors produce on save
+    - Files whose bytes hash to the last rendered content are left alone;
+      HTML for previously seen content is reused from the cache
+    - Files that would overwrite another file's output are reported and
+      skipped (a file already being watched keeps its output)
+    """
+
+    def __init__(
+        self,
+        patterns: List[str],
+        output_dir: Optional[Path] = None,
+        outputs: Optional[Dict[Path, Path]] = None,
+        debounce: float = WATCH_DEBOUNCE_SECONDS
+    ):
+        self.patterns = patterns
+        self.output_dir = output_dir
+        self.outputs = outputs or {}
+        self.debounce = debounce
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+        self._hashes: Dict[Path, str] = {}
+        self._pending: Dict[Path, float] = {}
+        self._canvases: "OrderedDict[str, dict]" = OrderedDict()
+        self._html: "OrderedDict[str, str]" = OrderedDict()
+        self._skipped: set = set()
+
+    def output_for(self, path: Path) -> Path:
+        return self.outputs.get(path) or default_output_path(path, self.output_dir)
+
+    def _cache(self, cache: OrderedDict, key: str, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > WATCH_CACHE_ENTRIES:
+            cache.popitem(last=False)
+
+    def scan(self, now: float):
+        """Note files whose size or mtime changed since the last poll."""
+        current = {}
+        for path in expand_inputs(self.patterns):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                current[path] = (stat.st_mtime_ns, stat.st_size)
+
+        # Files already being watched keep their output over newly found ones
+        claimants = sorted(current, key=lambda path: (path not in self._stats, path))
+        collisions = output_collisions({path: self.output_for(path) for path in claimants})
+        skipped = {path for inputs in collisions.values() for path in inputs[1:]}
+        if skipped - self._skipped:
+            report_collisions(collisions)
+        self._skipped = skipped
+        for path in skipped:
+            del current[path]
+
+        for path in set(self._stats) - set(current):
+            print(f"- {path} removed")
+            self._stats.pop(path)
+            self._hashes.pop(path, None)
+            self._pending.pop(path, None)
+
+        for path, signature in current.items():
+            if self._stats.get(path) != signature:
+                self._stats[path] = signature
+                self._pending[path] = now
+
+    def rebuild(self, path: Path) -> Optional[float]:
+        """Re-render one file if its content changed; returns seconds taken."""
+        started = time.perf_counter()
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            print(f"✗ {path}: {e}")
+            return None
+
+        digest = hashlib.sha256(raw).hexdigest()
+        if self._hashes.get(path) == digest:
+            return None
+        self._hashes[path] = digest
+
+        output_file = self.output_for(path)
+        try:
+            html_content = self._html.get(digest)
+            if html_content is None:
+                canvas_data = self._canvases.get(digest)
+                if canvas_data is None:
+                    canvas_data = json.loads(raw)
+                    self._cache(self._canvases, digest, canvas_data)
+                html_content = generate_visual_canvas_html(canvas_data)
+                self._cache(self._html, digest, html_content)
+            else:
+                self._html.move_to_end(digest)
+            atomic_write(output_file, html_content)
+        except json.JSONDecodeError as e:
+            # Reported once per content; the next save retries
+            print(f"✗ {path}: Invalid JSON: {e}")
+            return None
+        except Exception as e:
+            print(f"✗ {path}: {type(e).__name__}: {e}")
+            return None
+
+        seconds = time.perf_counter() - started
+        print(f"↻ {path} → {output_file} ({seconds * 1000:.1f} ms)")
+        return seconds
+
+    def poll(self, now: Optional[float] = None) -> int:
+        """Scan once and rebuild every settled change; returns files rebuilt."""
+        now = time.monotonic() if now is None else now
+        self.scan(now)
+        settled = [path for path, changed in self._pending.items() if now - changed >= self.debounce]
+        rebuilt = 0
+        for path in sorted(settled):
+            del self._pending[path]
+            if self.rebuild(path) is not None:
+                rebuilt += 1
+        return rebuilt
+
+    def run(self, interval: float = WATCH_INTERVAL_SECONDS):
+        """Render everything once, then poll until interrupted."""
+        self.scan(time.monotonic())
+        for path in sorted(self._pending):
+            self.rebuild(path)
+        self._pending.clear()
+        print(f"👀 Watching {len(self._stats)} canvas file(s); press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            print("\n✓ Stopped watching")
+
+
+def render_single(input_file: Path, output_file: Path):
+    """Original one-file mode with step-by-step output."""
     # Read JSON
     try:
         with open(input_file, 'r') as f:
@@ -42,7 +333,7 @@ def main():
         print(f"✗ Error: Invalid JSON in {input_file}")
         print(f"  {e}")
         sys.exit(1)
-    
+
     # Generate HTML
     try:
         html_content = generate_visual_canvas_html(canvas_data)
@@ -50,11 +341,10 @@ def main():
     except Exception as e:
         print(f"✗ Error generating HTML: {e}")
         sys.exit(1)
-    
+
     # Write output
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        atomic_write(output_file, html_content)
         print(f"✓ Saved visual canvas to: {output_file}")
         print(f"\n✨ Success! Open {output_file} in your browser to view the canvas.")
     except Exception as e:
@@ -62,5 +352,79 @@ def main():
         sys.exit(1)
 
 
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate visual HTML canvases from canvas JSON.",
+        epilog=(
+            "Examples:\n"
+            "  python generate_visual_canvas.py my_canvas.json\n"
+            "  python generate_visual_canvas.py my_canvas.json visual_canvas.html\n"
+            "  python generate_visual_canvas.py canvases/ -o rendered/ -j 8\n"
+            "  python generate_visual_canvas.py --jsonl nightly.jsonl -o rendered/\n"
+            "  python generate_visual_canvas.py canvases/ --watch"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inputs", nargs="*", help="canvas JSON files, directories or glob patterns")
+    parser.add_argument("--jsonl", metavar="PATH", help="read one canvas per line from PATH ('-' for stdin)")
+    parser.add_argument("-o", "--output-dir", type=Path, help="directory for rendered HTML files")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--watch", action="store_true", help="re-render inputs whenever their content changes")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL_SECONDS, help="watch polling interval in seconds")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS, help="seconds a file must be unchanged before it is rebuilt")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+
+    if not args.inputs and not args.jsonl:
+        print("Usage: python generate_visual_canvas.py <canvas.json> [output.html]")
+        print("       python generate_visual_canvas.py <files|dirs|globs>... [-o out_dir] [-j jobs]")
+        print("       python generate_visual_canvas.py --jsonl <canvases.jsonl|-> [-o out_dir]")
+        print("       python generate_visual_canvas.py <files|dirs|globs>... --watch [-o out_dir]")
+        print("\nExample:")
+        print("  python generate_visual_canvas.py my_canvas.json")
+        print("  python generate_visual_canvas.py my_canvas.json visual_canvas.html")
+        sys.exit(1)
+
+    if args.watch:
+        if args.jsonl:
+            print("✗ Error: --watch works with files, directories or globs, not --jsonl")
+            sys.exit(1)
+        patterns = args.inputs
+        outputs = {}
+        if len(patterns) == 2 and patterns[1].endswith(".html"):
+            patterns = patterns[:1]
+            outputs[Path(patterns[0])] = Path(args.inputs[1])
+        CanvasWatcher(patterns, args.output_dir, outputs, args.debounce).run(args.interval)
+        return
+
+    # Original usage: one JSON file, optionally followed by the output path
+    if not args.jsonl and not args.output_dir and (
+        (len(args.inputs) == 1 and not Path(args.inputs[0]).is_dir() and not any(c in args.inputs[0] for c in "*?["))
+        or (len(args.inputs) == 2 and args.inputs[1].endswith(".html"))
+    ):
+        input_file = Path(args.inputs[0])
+        output_file = Path(args.inputs[1]) if len(args.inputs) == 2 else default_output_path(input_file)
+        render_single(input_file, output_file)
+        return
+
+    if args.jsonl:
+        output_dir = args.output_dir or Path(".")
+        status = run_batch(render_record, iter_jsonl_tasks(args.jsonl, output_dir), args.jobs)
+    else:
+        outputs = {path: default_output_path(path, args.output_dir) for path in expand_inputs(args.inputs)}
+        collisions = output_collisions(outputs)
+        if collisions:
+            report_collisions(collisions)
+            print("✗ Error: inputs with the same file name need separate output directories")
+            sys.exit(1)
+        tasks = [(str(path), str(output_file)) for path, output_file in outputs.items()]
+        status = run_batch(render_file, tasks, args.jobs)
+    sys.exit(status)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,273 @@
+"""
+Asyncio backend that runs Claude calls off the Streamlit script thread.
+
+- Calls run on a background event loop; the script thread only consumes
+  text chunks from a PendingCall
+- Identical requests (same session and latest user message) are coalesced
+  onto one model call; late subscribers replay earlier chunks, including
+  for FINISHED_TTL_SECONDS after a successful call completed
+- At most MAX_CONCURRENT_REQUESTS calls run at once across all sessions;
+  a call that waits longer than SLOT_WAIT_SECONDS for a slot fails
+- A cancelled call releases its concurrency slot immediately and closes the
+  underlying HTTP stream as soon as its current read returns
+"""
+
+import json
+import atexit
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterator, Optional, Callable
+
+from src.claude_client import ResponseStream, MAX_CONCURRENT_REQUESTS, SLOT_WAIT_SECONDS, get_client_registry
+
+# How long an abandoned call (e.g. interrupted by a rerun) waits for a new
+# subscriber before it is cancelled.
+DETACH_GRACE_SECONDS = 5.0
+# How long a successful call stays joinable after it finished, so a rerun
+# that resumes after the response completed replays it instead of sending
+# the request again.
+FINISHED_TTL_SECONDS = 30.0
+
+_END = object()
+
+
+class CallCancelled(RuntimeError):
+    """Raised to subscribers of a call that was cancelled."""
+
+
+class PendingCall:
+    """One in-flight model call, shared by every coalesced subscriber."""
+
+    def __init__(self, backend: "AgentBackend", key: str):
+        self.key = key
+        self.usage = None
+        self.error: Optional[BaseException] = None
+        self._backend = backend
+        self._chunks: List[str] = []
+        self._done = False
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._future = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def text(self) -> str:
+        with self._cond:
+            return "".join(self._chunks)
+
+    def _append(self, chunk: str):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def _finish(self, usage=None, error: Optional[BaseException] = None):
+        with self._cond:
+            if self._done:
+                return
+            self.usage = usage
+            self.error = error
+            self._done = True
+            self._cond.notify_all()
+
+    def iter_text(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the response text from the first chunk on, blocking for new
+        chunks; re-raises the call's error at the end. Leaving the iterator
+        early detaches this subscriber.
+        """
+        index = 0
+        try:
+            while True:
+                with self._cond:
+                    while index >= len(self._chunks) and not self._done:
+                        if not self._cond.wait(timeout):
+                            raise TimeoutError("Timed out waiting for Claude response")
+                    chunks = self._chunks[index:]
+                    finished = self._done
+                index += len(chunks)
+                yield from chunks
+                if finished and index >= len(self._chunks):
+                    break
+            if self.error is not None:
+                raise self.error
+        finally:
+            self._backend._detach(self)
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        """Block until the call completes and return the full text."""
+        return "".join(self.iter_text(timeout))
+
+    def cancel(self):
+        """Cancel the call for every subscriber and free its slot now."""
+        self._backend._cancel(self)
+
+
+class AgentBackend:
+    """
+    Background event loop that executes streaming Claude calls.
+
+    Concurrency is capped by an asyncio semaphore; blocking reads from the
+    SDK stream run in a small thread pool so the loop stays responsive.
+    Calls are kept by request key while running and, if they succeeded,
+    for finished_ttl_seconds afterwards.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        detach_grace_seconds: float = DETACH_GRACE_SECONDS,
+        finished_ttl_seconds: float = FINISHED_TTL_SECONDS,
+        slot_wait_seconds: float = SLOT_WAIT_SECONDS,
+        stream_factory: Callable[..., Any] = ResponseStream
+    ):
+        self.detach_grace_seconds = detach_grace_seconds
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self.slot_wait_seconds = slot_wait_seconds
+        self._stream_factory = stream_factory
+        self._inflight: Dict[str, PendingCall] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2 * max(1, max_concurrency), thread_name_prefix="agent-io")
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-backend", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def request_key(session_id: str, messages: List[Dict[str, Any]], turn: Optional[int] = None) -> str:
+        """
+        Coalescing key: the session plus its latest user message and that
+        message's turn (so sending the same text again is a new request).
+
+        turn should be the message's index in the full conversation; the
+        list sent to the model may be compacted, so its own positions can
+        repeat. Without it the position within messages is used.
+        """
+        position = next((i for i in range(len(messages) - 1, -1, -1) if messages[i]["role"] == "user"), -1)
+        latest = messages[position]["content"] if position >= 0 else ""
+        payload = json.dumps([session_id, position if turn is None else turn, latest], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def submit(
+        self,
+        session_id: str,
+        messages: List[Dict[str, Any]],
+        api_key: str,
+        system: str,
+        turn: Optional[int] = None
+    ) -> PendingCall:
+        """
+        Start a call, or join the identical one in flight or recently
+        finished (see request_key for turn).
+        """
+        key = self.request_key(session_id, messages, turn)
+        with self._lock:
+            call = self._inflight.get(key)
+            if call is not None and (not call.done or call.error is None):
+                call._subscribers += 1
+                return call
+            call = PendingCall(self, key)
+            call._subscribers = 1
+            self._inflight[key] = call
+        call._future = asyncio.run_coroutine_threadsafe(self._run(call, messages, api_key, system), self._loop)
+        call._future.add_done_callback(lambda future: self._on_done(call, future))
+        return call
+
+    def _on_done(self, call: PendingCall, future):
+        # Covers a cancel that lands before the coroutine started running
+        if future.cancelled():
+            call._finish(error=CallCancelled("Claude call was cancelled"))
+        # Failed calls are dropped at once so the next submit retries
+        ttl = self.finished_ttl_seconds if call.error is None else 0
+        self._loop.call_soon_threadsafe(self._loop.call_later, ttl, self._forget, call)
+
+    def _forget(self, call: PendingCall):
+        with self._lock:
+            if self._inflight.get(call.key) is call:
+                del self._inflight[call.key]
+
+    async def _run(self, call: PendingCall, messages: List[Dict[str, Any]], api_key: str, system: str):
+        loop = asyncio.get_running_loop()
+        io_lock = threading.Lock()
+        iterator = None
+
+        def step():
+            with io_lock:
+                return next(iterator, _END)
+
+        def close():
+            # Waits for any read still running in another worker, then closes
+            with io_lock:
+                iterator.close()
+
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.slot_wait_seconds)
+            except asyncio.TimeoutError:
+                raise RuntimeError("Too many concurrent Claude requests; please retry in a moment") from None
+            try:
+                client = get_client_registry().get(api_key)
+                stream = self._stream_factory(client, messages, system=system)
+                iterator = iter(stream)
+                while True:
+                    chunk = await loop.run_in_executor(self._executor, step)
+                    if chunk is _END:
+                        break
+                    call._append(chunk)
+            finally:
+                self._semaphore.release()
+            call._finish(usage=getattr(stream, "usage", None))
+        except asyncio.CancelledError:
+            call._finish(error=CallCancelled("Claude call was cancelled"))
+            if iterator is not None:
+                self._executor.submit(close)
+        except Exception as e:
+            call._finish(error=e)
+
+    def _cancel(self, call: PendingCall):
+        if call._future is not None:
+            call._future.cancel()
+
+    def _cancel_if_orphaned(self, call: PendingCall):
+        with self._lock:
+            orphaned = call._subscribers == 0 and not call.done
+        if orphaned:
+            self._cancel(call)
+
+    def _detach(self, call: PendingCall):
+        with self._lock:
+            call._subscribers -= 1
+            orphaned = call._subscribers == 0 and not call.done
+        if orphaned:
+            self._loop.call_soon_threadsafe(
+                self._loop.call_later, self.detach_grace_seconds, self._cancel_if_orphaned, call
+            )
+
+    def shutdown(self):
+        """Cancel in-flight calls, stop the loop and close the pooled clients."""
+        with self._lock:
+            calls = list(self._inflight.values())
+        for call in calls:
+            call.cancel()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+        get_client_registry().close()
+
+
+_backend: Optional[AgentBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_agent_backend() -> AgentBackend:
+    """Return the process-wide agent backend, starting it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = AgentBackend()
+            atexit.register(_backend.shutdown)
+        return _backend
@@ -0,0 +1,350 @@
+"""
+Streaming bulk import of use cases from CSV, JSONL or Parquet.
+
+Rows are read and validated in chunks of chunk_size, so memory stays
+bounded by one chunk plus the results the caller keeps. Each valid row is
+normalized into the USE_CASE_DATA schema (see src/agent_prompt.py), and
+every chunk is scored in one compute_roi_arrays call. Invalid rows are
+reported, never raised.
+
+Columns (CSV/Parquet, or flat JSONL objects; JSONL may also use the nested
+USE_CASE_DATA layout):
+- title (required), id, problem, tenant
+- near_term_annual_benefit, long_term_annual_benefit, initial_cost,
+  near_term_annual_cost (required), long_term_annual_cost (defaults to
+  near_term_annual_cost)
+- effort_score_1_to_10 (required, integer 1-10)
+- probability_0_to_1 (required), impact_0_to_1 (default DEFAULT_RISK_IMPACT)
+- kpis, risks_list, dependencies: lists, or ";"-separated text
+
+Money accepts "$450,000"; probabilities accept "30%". With a tenant, ids
+and id references in dependencies become "<tenant>/<id>", so several
+imports can share one session without id collisions. Rows whose id is
+already taken (existing_ids, or an earlier row) are reported as errors
+rather than imported over the existing use case.
+
+Parquet needs pyarrow.
+"""
+
+import io
+import csv
+import json
+import math
+from pathlib import Path
+from typing import Dict, Any, Collection, List, Optional, Iterator, Tuple, Union
+
+import numpy as np
+
+from src.cashflow import DEFAULT_HORIZON_YEARS, DEFAULT_DISCOUNT_RATE, Discount
+from src.env_settings import env_int
+from src.roi_calculations import compute_roi_arrays, _roi_input_arrays, _attach_metrics, _cash_flow_columns
+
+DEFAULT_CHUNK_SIZE = env_int("BULK_IMPORT_CHUNK_ROWS", 5000, minimum=1)
+# Errors kept in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 10_000
+DEFAULT_RISK_IMPACT = 0.3
+
+FORMATS = ("csv", "jsonl", "parquet")
+_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet", ".pq": "parquet"}
+
+_MONEY_FIELDS = [
+    "near_term_annual_benefit",
+    "long_term_annual_benefit",
+    "initial_cost",
+    "near_term_annual_cost",
+    "long_term_annual_cost",
+]
+_REQUIRED_FIELDS = [
+    "title",
+    "near_term_annual_benefit",
+    "long_term_annual_benefit",
+    "initial_cost",
+    "near_term_annual_cost",
+    "effort_score_1_to_10",
+    "probability_0_to_1",
+]
+# Nested USE_CASE_DATA sections flattened before validation
+_SECTIONS = ("expected_benefits", "costs", "risk")
+_ALIASES = {
+    "effort": "effort_score_1_to_10",
+    "risk_probability": "probability_0_to_1",
+    "probability": "probability_0_to_1",
+    "risk_impact": "impact_0_to_1",
+    "impact": "impact_0_to_1",
+    "risks": "risks_list",
+}
+
+
+def detect_format(name: str) -> str:
+    """File format from the file name's extension."""
+    fmt = _EXTENSIONS.get(Path(name).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported file type: {name} (expected {', '.join(_EXTENSIONS)})")
+    return fmt
+
+
+def _text_stream(source) -> io.TextIOBase:
+    if isinstance(source, (str, Path)):
+        return open(source, "r", encoding="utf-8-sig", newline="")
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+
+def _iter_rows(source, fmt: str, chunk_size: int) -> Iterator[List[Tuple[int, Any]]]:
+    """Chunks of (row number, raw row); row numbers are 1-based data rows."""
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet import needs pyarrow: pip install pyarrow") from e
+        row = 0
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            rows = batch.to_pylist()
+            yield [(row + i + 1, r) for i, r in enumerate(rows)]
+            row += len(rows)
+        return
+
+    stream = _text_stream(source)
+    try:
+        if fmt == "csv":
+            lines = enumerate(csv.DictReader(stream), 1)
+        else:
+            lines = ((i, line) for i, line in enumerate(stream, 1) if line.strip())
+        chunk = []
+        for item in lines:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if isinstance(source, (str, Path)):
+            stream.close()
+        elif stream is not source:
+            stream.detach()  # leave the caller's binary file open
+
+
+def _flatten(row: Dict[str, Any]) -> Dict[str, Any]:
+    flat = {}
+    for key, value in row.items():
+        if key in _SECTIONS and isinstance(value, dict):
+            flat.update(value)
+        elif key is not None:
+            flat[str(key).strip()] = value
+    for alias, field in _ALIASES.items():
+        if alias in flat and field not in flat:
+            flat[field] = flat.pop(alias)
+    return flat
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip()) or \
+        (isinstance(value, float) and math.isnan(value))
+
+
+def _number(value, percent: bool = False) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        # "$450,000" / "30%"
+        text = value.strip().replace(",", "").replace("$", "").replace("_", "")
+        scale = 1.0
+        if percent and text.endswith("%"):
+            text, scale = text[:-1], 0.01
+        number = float(text) * scale
+    if not math.isfinite(number):
+        raise ValueError("not a finite number")
+    return number
+
+
+def _text_list(value) -> List[Any]:
+    if _blank(value):
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return [part.strip() for part in str(value).split(";") if part.strip()]
+
+
+def _namespaced(tenant: Optional[str], ref: str) -> str:
+    return f"{tenant}/{ref}" if tenant and "/" not in ref else ref
+
+
+def normalize_row(row: Dict[str, Any], tenant: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Validate one raw row and build a USE_CASE_DATA dict.
+
+    Returns (use case, []) or (None, [error, ...]).
+    """
+    flat = _flatten(row)
+    errors = [f"missing {field}" for field in _REQUIRED_FIELDS if _blank(flat.get(field))]
+    if errors:
+        return None, errors
+
+    values = {}
+    for field in _MONEY_FIELDS:
+        raw = flat.get(field)
+        if field == "long_term_annual_cost" and _blank(raw):
+            raw = flat["near_term_annual_cost"]
+        try:
+            values[field] = _number(raw)
+        except (TypeError, ValueError):
+            errors.append(f"{field}: {raw!r} is not a number")
+            continue
+        if values[field] < 0:
+            errors.append(f"{field}: must not be negative")
+
+    for field, default in (("probability_0_to_1", None), ("impact_0_to_1", DEFAULT_RISK_IMPACT)):
+        raw = flat.get(field)
+        try:
+            values[field] = default if _blank(raw) else _number(raw, percent=True)
+        except (TypeError, ValueError):
+            errors.append(f"{field}: {raw!r} is not a number")
+            continue
+        if not 0 <= values[field] <= 1:
+            errors.append(f"{field}: {values[field]} is outside 0-1")
+
+    raw = flat["effort_score_1_to_10"]
+    try:
+        effort = _number(raw)
+        if effort != int(effort) or not 1 <= effort <= 10:
+            errors.append(f"effort_score_1_to_10: {raw!r} is not an integer from 1 to 10")
+    except (TypeError, ValueError):
+        errors.append(f"effort_score_1_to_10: {raw!r} is not a number")
+
+    if errors:
+        return None, errors
+
+    tenant = str(flat["tenant"]).strip() if not _blank(flat.get("tenant")) else tenant
+    use_case = {
+        "title": str(flat["title"]).strip(),
+        "problem": "" if _blank(flat.get("problem")) else str(flat["problem"]).strip(),
+        "kpis": _text_list(flat.get("kpis")),
+        "expected_benefits": {
+            "near_term_annual_benefit": values["near_term_annual_benefit"],
+            "long_term_annual_benefit": values["long_term_annual_benefit"],
+            "soft_benefits": _text_list(flat.get("soft_benefits"))
+        },
+        "costs": {
+            "initial_cost": values["initial_cost"],
+            "near_term_annual_cost": values["near_term_annual_cost"],
+            "long_term_annual_cost": values["long_term_annual_cost"]
+        },
+        "effort_score_1_to_10": int(effort),
+        "risk": {
+            "probability_0_to_1": values["probability_0_to_1"],
+            "impact_0_to_1": values["impact_0_to_1"],
+            "risks_list": _text_list(flat.get("risks_list"))
+        },
+        "dependencies": [_namespaced(tenant, str(ref)) for ref in _text_list(flat.get("dependencies"))]
+    }
+    if not _blank(flat.get("id")):
+        use_case["id"] = _namespaced(tenant, str(flat["id"]).strip())
+    if tenant:
+        use_case["tenant"] = tenant
+    return use_case, []
+
+
+def iter_import(
+    source: Union[str, Path, Any],
+    fmt: Optional[str] = None,
+    tenant: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    id_prefix: str = "IMP",
+    horizon_years: int = DEFAULT_HORIZON_YEARS,
+    discount: Discount = DEFAULT_DISCOUNT_RATE,
+    existing_ids: Optional[Collection[str]] = None
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Yield (use cases with ROI metrics, errors) per chunk.
+
+    source is a path or a binary/text file object; fmt defaults to the
+    path's extension. Rows without an id get f"{id_prefix}{row:05d}", so
+    pass a different id_prefix for every import into the same session.
+    Each error is {"row", "id", "title", "errors": [...]}; ids (after
+    namespacing) that repeat an earlier row or are in existing_ids are
+    errors too. horizon_years and discount set the cash-flow metrics (see
+    compute_all_roi).
+    """
+    fmt = fmt or detect_format(str(getattr(source, "name", source)))
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    existing_ids = existing_ids or ()
+    seen_ids = set()
+    for chunk in _iter_rows(source, fmt, max(1, chunk_size)):
+        use_cases = []
+        errors = []
+        for row_number, raw in chunk:
+            if fmt == "jsonl":
+                try:
+                    raw = json.loads(raw)
+                except ValueError as e:
+                    errors.append({"row": row_number, "id": None, "title": None, "errors": [f"invalid JSON: {e}"]})
+                    continue
+            if not isinstance(raw, dict):
+                errors.append({"row": row_number, "id": None, "title": None, "errors": ["row is not an object"]})
+                continue
+
+            use_case, row_errors = normalize_row(raw, tenant)
+            if use_case is not None:
+                use_case.setdefault("id", _namespaced(use_case.get("tenant"), f"{id_prefix}{row_number:05d}"))
+                if use_case["id"] in seen_ids:
+                    row_errors = [f"duplicate id {use_case['id']}"]
+                elif use_case["id"] in existing_ids:
+                    row_errors = [f"id {use_case['id']} is already used by an existing use case"]
+                else:
+                    seen_ids.add(use_case["id"])
+                    use_cases.append(use_case)
+                    continue
+            errors.append({"row": row_number, "id": raw.get("id"), "title": raw.get("title"), "errors": row_errors})
+
+        if use_cases:
+            inputs = _roi_input_arrays(use_cases)
+            use_cases = _attach_metrics(
+                use_cases,
+                compute_roi_arrays(*inputs, decimals=None),
+                _cash_flow_columns(inputs, horizon_years, discount),
+                copy=False
+            )
+        yield use_cases, errors
+
+
+def import_use_cases(
+    source: Union[str, Path, Any],
+    fmt: Optional[str] = None,
+    tenant: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    id_prefix: str = "IMP",
+    horizon_years: int = DEFAULT_HORIZON_YEARS,
+    discount: Discount = DEFAULT_DISCOUNT_RATE,
+    existing_ids: Optional[Collection[str]] = None
+) -> Dict[str, Any]:
+    """
+    Import a whole file (see iter_import).
+
+    Returns {"use_cases", "errors" (first MAX_REPORTED_ERRORS), "rows",
+    "imported", "failed"}.
+    """
+    result = {"use_cases": [], "errors": [], "rows": 0, "imported": 0, "failed": 0}
+    for use_cases, errors in iter_import(source, fmt, tenant, chunk_size, id_prefix, horizon_years, discount, existing_ids):
+        result["use_cases"].extend(use_cases)
+        room = MAX_REPORTED_ERRORS - len(result["errors"])
+        result["errors"].extend(errors[:max(room, 0)])
+        result["imported"] += len(use_cases)
+        result["failed"] += len(errors)
+    result["rows"] = result["imported"] + result["failed"]
+    return result
+
+
+def error_report_csv(errors: List[Dict[str, Any]]) -> str:
+    """Per-row error report as CSV (row, id, title, error)."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["row", "id", "title", "error"])
+    for entry in errors:
+        writer.writerow([entry["row"], entry["id"] or "", entry["title"] or "", "; ".join(entry["errors"])])
+    return out.getvalue()
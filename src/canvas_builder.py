@@ -2,64 +2,214 @@
 Canvas and roadmap generation following the exact specification format.
 """
 
-from typing import Dict, Any, List
+import heapq
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 
+from src.dependency_graph import DependencyGraph
+from src.env_settings import env_int
+from src.instrumentation import instrument
+
+# Team capacity for the roadmap, overridable through the environment:
+# initiatives running at once (0 = unlimited) and, optionally, the summed
+# effort scores the team can carry at once (0 = no effort limit)
+DEFAULT_MAX_PARALLEL = env_int("ROADMAP_MAX_PARALLEL", 3, minimum=0) or None
+DEFAULT_EFFORT_CAPACITY = env_int("ROADMAP_EFFORT_CAPACITY", 0, minimum=0) or None
+# Months between a dependency finishing and its dependent starting
+DEPENDENCY_GAP_MONTHS = 1
+ROADMAP_BUCKETS = ("Q1", "1-Year", "3-Year")
+
+
+def schedule_initiatives(
+    durations: List[int],
+    dependencies: List[List[int]],
+    weights: Optional[List[int]] = None,
+    max_parallel: Optional[int] = DEFAULT_MAX_PARALLEL,
+    effort_capacity: Optional[int] = None,
+    gap: int = DEPENDENCY_GAP_MONTHS,
+    order: Optional[List[int]] = None
+) -> List[int]:
+    """
+    List-schedule initiatives under a team capacity; returns start months.
+    
+    - An initiative starts at least `gap` months after all of its
+      dependencies (indices into durations) have ended
+    - At most max_parallel initiatives run at once (None: unlimited) and,
+      with effort_capacity, their summed weights stay within it; a single
+      initiative heavier than the capacity runs on its own
+    - Whenever capacity frees up, ready initiatives start in order of their
+      longest remaining dependency chain (critical path first), then input
+      order, which keeps the overall makespan short
+    
+    Runs in O((n + e) log n) for n initiatives and e dependency edges.
+    `order` may pass a precomputed topological order. A dependency cycle
+    is broken by releasing its earliest initiative.
+    """
+    n = len(durations)
+    weights = weights or [1] * n
+    successors = [[] for _ in range(n)]
+    blocked = [0] * n
+    for i, deps in enumerate(dependencies):
+        for dep in set(deps):
+            if dep != i:
+                successors[dep].append(i)
+                blocked[i] += 1
+    
+    # Critical-path length from each initiative to the end (Kahn order)
+    if order is None:
+        remaining = blocked[:]
+        order = [i for i in range(n) if remaining[i] == 0]
+        for i in order:
+            for succ in successors[i]:
+                remaining[succ] -= 1
+                if remaining[succ] == 0:
+                    order.append(succ)
+    chain = list(durations)
+    for i in reversed(order):
+        for succ in successors[i]:
+            chain[i] = max(chain[i], durations[i] + gap + chain[succ])
+    
+    starts: List[Optional[int]] = [None] * n
+    release = [0] * n
+    ready = [(-chain[i], i) for i in range(n) if blocked[i] == 0]
+    heapq.heapify(ready)
+    waiting = []   # (release month, priority, index): dependencies done
+    running = []   # (end month, index)
+    lightest = min(weights) if weights else 0
+    active = load = scheduled = now = 0
+    
+    while scheduled < n:
+        while waiting and waiting[0][0] <= now:
+            _, priority, i = heapq.heappop(waiting)
+            heapq.heappush(ready, (priority, i))
+        
+        # Start everything that fits, highest priority first
+        deferred = []
+        while ready and (max_parallel is None or active < max(1, max_parallel)):
+            priority, i = heapq.heappop(ready)
+            if effort_capacity is not None and active and load + weights[i] > effort_capacity:
+                deferred.append((priority, i))
+                if effort_capacity - load < lightest:
+                    break
+                continue
+            starts[i] = now
+            active += 1
+            load += weights[i]
+            scheduled += 1
+            heapq.heappush(running, (now + durations[i], i))
+        for item in deferred:
+            heapq.heappush(ready, item)
+        
+        if not running and not waiting:
+            if scheduled < n and not ready:
+                # Only initiatives inside a dependency cycle are left
+                i = next(j for j in range(n) if starts[j] is None and blocked[j] > 0)
+                blocked[i] = 0
+                heapq.heappush(ready, (-chain[i], i))
+            continue
+        
+        now = min(
+            running[0][0] if running else float("inf"),
+            waiting[0][0] if waiting else float("inf")
+        )
+        while running and running[0][0] <= now:
+            end, i = heapq.heappop(running)
+            active -= 1
+            load -= weights[i]
+            for succ in successors[i]:
+                release[succ] = max(release[succ], end + gap)
+                blocked[succ] -= 1
+                if blocked[succ] == 0 and starts[succ] is None:
+                    heapq.heappush(waiting, (release[succ], -chain[succ], succ))
+    
+    return starts
+
+
+def _initiative_phases(effort: int) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """Phase plan for one initiative: (total_months, phases)."""
+    # Determine total duration based on effort
+    if effort <= 3:
+        total_months = 6  # Quick win: 3mo discovery + 3mo deploy
+        dev_months = 1
+    elif effort <= 6:
+        total_months = 12  # 1-year: 3mo discovery + 6mo dev + 3mo deploy
+        dev_months = 6
+    else:
+        total_months = 36  # 3-year: 3mo discovery + 12-24mo dev + 3mo deploy
+        dev_months = 24
+    
+    phases = {
+        "Discovery & Planning": {
+            "duration": 3,
+            "description": "Requirements gathering, stakeholder alignment, resource planning",
+            "deliverables": ["Business requirements", "Technical architecture", "Team structure"]
+        },
+        "Design & Preparation": {
+            "duration": 3,
+            "description": "Solution design, vendor selection, infrastructure setup",
+            "deliverables": ["System design", "Implementation plan", "Infrastructure provisioned"]
+        },
+        "Development & Integration": {
+            "duration": dev_months,
+            "description": "Model development, system integration, quality assurance",
+            "deliverables": ["Trained models", "API integrations", "Test reports"]
+        },
+        "Deployment & Rollout": {
+            "duration": 3,
+            "description": "Pilot testing, user training, production deployment",
+            "deliverables": ["Production deployment", "User documentation", "Training completion"]
+        },
+        "Operations & Optimization": {
+            "duration": 3,
+            "description": "Monitoring, performance tuning, continuous improvement",
+            "deliverables": ["Monitoring dashboards", "Performance metrics", "Optimization roadmap"]
+        }
+    }
+    return total_months, phases
+
 
-def generate_detailed_timeline(use_cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+def generate_detailed_timeline(
+    use_cases: List[Dict[str, Any]],
+    max_parallel: Optional[int] = DEFAULT_MAX_PARALLEL,
+    effort_capacity: Optional[int] = DEFAULT_EFFORT_CAPACITY,
+    graph: Optional[DependencyGraph] = None
+) -> Dict[str, Any]:
     """
     Generate detailed timeline with phases for each initiative
     Includes: Discovery (3mo), Design (3mo), Development (3-12mo), Deployment (1-3mo), Operations (ongoing)
+    
+    Initiatives are placed by schedule_initiatives: independent ones run in
+    parallel up to the team capacity (max_parallel initiatives and/or
+    effort_capacity summed effort points), and each starts after the use
+    cases listed in its "dependencies" (ids or titles) are done. Pass the
+    DependencyGraph of use_cases to reuse one already built; a dependency
+    cycle raises DependencyCycleError.
+    
+    Entries are keyed by title; a repeated title gets the use case id
+    appended so no initiative is overwritten.
     """
-    detailed_timeline = {}
     current_date = datetime.now()
-    start_offset = 0
+    graph = graph or DependencyGraph(use_cases)
+    dependencies = graph.dependencies
     
-    for uc in use_cases:
-        effort = uc.get("effort_score_1_to_10", 5)
-        title = uc["title"]
-        
-        # Determine total duration based on effort
-        if effort <= 3:
-            total_months = 6  # Quick win: 3mo discovery + 3mo deploy
-            dev_months = 1
-        elif effort <= 6:
-            total_months = 12  # 1-year: 3mo discovery + 6mo dev + 3mo deploy
-            dev_months = 6
-        else:
-            total_months = 36  # 3-year: 3mo discovery + 12-24mo dev + 3mo deploy
-            dev_months = 24
-        
-        phases = {
-            "Discovery & Planning": {
-                "duration": 3,
-                "description": "Requirements gathering, stakeholder alignment, resource planning",
-                "deliverables": ["Business requirements", "Technical architecture", "Team structure"]
-            },
-            "Design & Preparation": {
-                "duration": 3,
-                "description": "Solution design, vendor selection, infrastructure setup",
-                "deliverables": ["System design", "Implementation plan", "Infrastructure provisioned"]
-            },
-            "Development & Integration": {
-                "duration": dev_months,
-                "description": "Model development, system integration, quality assurance",
-                "deliverables": ["Trained models", "API integrations", "Test reports"]
-            },
-            "Deployment & Rollout": {
-                "duration": 3,
-                "description": "Pilot testing, user training, production deployment",
-                "deliverables": ["Production deployment", "User documentation", "Training completion"]
-            },
-            "Operations & Optimization": {
-                "duration": 3,
-                "description": "Monitoring, performance tuning, continuous improvement",
-                "deliverables": ["Monitoring dashboards", "Performance metrics", "Optimization roadmap"]
-            }
-        }
+    plans = [_initiative_phases(uc.get("effort_score_1_to_10", 5)) for uc in use_cases]
+    durations = [sum(phase["duration"] for phase in phases.values()) for _, phases in plans]
+    starts = schedule_initiatives(
+        durations,
+        dependencies,
+        weights=[uc.get("effort_score_1_to_10", 5) for uc in use_cases],
+        max_parallel=max_parallel,
+        effort_capacity=effort_capacity,
+        order=graph.topological_order()
+    )
+    
+    detailed_timeline = {}
+    for i in sorted(range(len(use_cases)), key=lambda i: (starts[i], i)):
+        uc = use_cases[i]
+        total_months, phases = plans[i]
         
         timeline_phases = []
-        phase_start_offset = start_offset
+        phase_start_offset = starts[i]
         
         for phase_name, phase_info in phases.items():
             phase_duration = phase_info["duration"]
@@ -77,22 +227,35 @@ def generate_detailed_timeline(use_cases: List[Dict[str, Any]]) -> Dict[str, Any
             
             phase_start_offset += phase_duration
         
-        detailed_timeline[title] = {
-            "effort": effort,
+        key = uc["title"]
+        if key in detailed_timeline:
+            key = f"{key} ({uc.get('id', i + 1)})"
+        detailed_timeline[key] = {
+            "id": uc.get("id"),
+            "effort": uc.get("effort_score_1_to_10", 5),
             "total_duration_months": total_months,
-            "overall_start": (current_date + timedelta(days=start_offset * 30)).strftime("%Y-%m-%d"),
+            "overall_start": (current_date + timedelta(days=starts[i] * 30)).strftime("%Y-%m-%d"),
             "overall_end": (current_date + timedelta(days=phase_start_offset * 30)).strftime("%Y-%m-%d"),
+            "start_month": starts[i],
+            "end_month": phase_start_offset,
+            "depends_on": [use_cases[dep]["title"] for dep in dependencies[i]],
             "phases": timeline_phases,
             "expected_benefit": f"${uc['expected_benefits'].get('near_term_annual_benefit', 0):,.0f}/year",
             "roi": f"{uc.get('near_term_roi_percent', 'N/A')}%"
         }
-        
-        start_offset = phase_start_offset + 1  # Add buffer between initiatives
     
     return detailed_timeline
 
 
-def assign_roadmap_timeline(use_cases: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+def _case_key(uc: Dict[str, Any]) -> str:
+    """Use case id, or its title when it has none."""
+    return uc.get("id") or uc["title"]
+
+
+def assign_roadmap_timeline(
+    use_cases: List[Dict[str, Any]],
+    graph: Optional[DependencyGraph] = None
+) -> Dict[str, List[Dict[str, Any]]]:
     """
     Assign use cases to timeline buckets:
     - Q1: Quick Wins
@@ -100,29 +263,31 @@ def assign_roadmap_timeline(use_cases: List[Dict[str, Any]]) -> Dict[str, List[D
     - 3-Year: Effort > 6
     
     Respect dependencies: If B depends on A, A must be in same or earlier bucket.
+    Use cases are visited in topological order and moved to the latest
+    bucket among their own and their dependencies'. A dependency cycle
+    raises DependencyCycleError.
     """
-    q1_cases = []
-    one_year_cases = []
-    three_year_cases = []
-    
+    graph = graph or DependencyGraph(use_cases)
+    ranks = []
     for uc in use_cases:
-        category = uc.get("category", "")
-        effort = uc["effort_score_1_to_10"]
-        
-        if category == "Quick Win":
-            q1_cases.append(uc)
-        elif effort <= 6:
-            one_year_cases.append(uc)
+        if uc.get("category", "") == "Quick Win":
+            ranks.append(0)
+        elif uc["effort_score_1_to_10"] <= 6:
+            ranks.append(1)
         else:
-            three_year_cases.append(uc)
+            ranks.append(2)
     
-    return {
-        "Q1": q1_cases,
-        "1-Year": one_year_cases,
-        "3-Year": three_year_cases
-    }
+    for i in graph.topological_order():
+        for dep in graph.dependencies[i]:
+            ranks[i] = max(ranks[i], ranks[dep])
+    
+    buckets = {bucket: [] for bucket in ROADMAP_BUCKETS}
+    for uc, rank in zip(use_cases, ranks):
+        buckets[ROADMAP_BUCKETS[rank]].append(uc)
+    return buckets
 
 
+@instrument("build_canvas")
 def build_canvas(
     use_cases: List[Dict[str, Any]],
     portfolio: Dict[str, Any],
@@ -131,18 +296,35 @@ def build_canvas(
     designed_by: str = "",
     designed_for: str = "",
     primary_goal: str = "",
-    strategic_focus: str = ""
+    strategic_focus: str = "",
+    max_parallel: Optional[int] = DEFAULT_MAX_PARALLEL,
+    effort_capacity: Optional[int] = DEFAULT_EFFORT_CAPACITY,
+    sensitivity: bool = False,
+    graph: Optional[DependencyGraph] = None
 ) -> Dict[str, Any]:
     """
     Build the complete AI ROI & Roadmap Canvas in exact specification format.
+    
+    max_parallel / effort_capacity set the team capacity used to schedule
+    the roadmap (see schedule_initiatives). With sensitivity=True a
+    "Sensitivity" section holds the tornado analysis of the portfolio
+    (see src/sensitivity.py). graph is the DependencyGraph of use_cases,
+    if already built; the roadmap uses its subgraph of the portfolio.
     """
     if not portfolio:
         return None
     
     selected = portfolio.get("selected_use_cases", [])
     
+    # One dependency graph for bucketing and scheduling
+    roadmap_graph = graph.subgraph(selected) if graph is not None else None
+    if roadmap_graph is None:
+        roadmap_graph = DependencyGraph(selected)
+    buckets = assign_roadmap_timeline(selected, roadmap_graph)
+    bucket_of = {_case_key(uc): bucket for bucket, cases in buckets.items() for uc in cases}
+    
     # Generate detailed timeline with phases for each initiative
-    detailed_timeline = generate_detailed_timeline(selected)
+    detailed_timeline = generate_detailed_timeline(selected, max_parallel, effort_capacity, roadmap_graph)
     
     # Also create simple timeline items for the main canvas view
     timeline_items = []
@@ -153,6 +335,7 @@ def build_canvas(
             "EndDate": timeline_info["overall_end"],
             "DurationMonths": timeline_info["total_duration_months"],
             "Milestone": f"{timeline_info['total_duration_months']}-month delivery",
+            "RoadmapBucket": bucket_of.get(timeline_info["id"] or initiative),
             "ROI": timeline_info["roi"],
             "ExpectedBenefit": timeline_info["expected_benefit"],
             "Effort": timeline_info["effort"],
@@ -286,9 +469,14 @@ def build_canvas(
         }
     }
     
+    if sensitivity:
+        from src.sensitivity import tornado
+        canvas["Sensitivity"] = tornado(use_cases, portfolio, graph=graph)
+    
     return canvas
 
 
+@instrument("canvas_to_markdown")
 def canvas_to_markdown(canvas: Dict[str, Any]) -> str:
     """Convert canvas JSON to readable Markdown format."""
     md = f"""# {canvas['Header']['CanvasTitle']}
@@ -380,7 +568,29 @@ def canvas_to_markdown(canvas: Dict[str, Any]) -> str:
 - **Note:** {canvas['PortfolioROI']['PortfolioNote']}
 
 ---
-
+{_sensitivity_markdown(canvas.get("Sensitivity"))}
 {canvas['Footer']['CreditLine']}
 """
     return md
+
+
+def _sensitivity_markdown(sensitivity: Optional[Dict[str, Any]]) -> str:
+    """Tornado table for canvas_to_markdown (empty without a Sensitivity section)."""
+    if not sensitivity:
+        return ""
+    swing = f"{sensitivity['swing']:.0%}"
+    rows = "\n".join(
+        f"| {bar['label']} | ${bar['low']:,.0f} | ${bar['high']:,.0f} | ${bar['range']:,.0f} |"
+        for bar in sensitivity["bars"]
+    )
+    return f"""
+## Sensitivity
+
+{sensitivity['metric_label']}: ${sensitivity['base']:,.0f} at current inputs
+
+| Input | -{swing} | +{swing} | Range |
+|-------|------|------|-------|
+{rows}
+
+---
+"""
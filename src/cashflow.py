@@ -0,0 +1,202 @@
+"""
+Multi-year cash-flow engine: NPV, IRR and fractional payback for many use
+cases at once.
+
+Cash flows are a 2-D array with one row per use case and one column per
+year (column 0 is year 0, the initial investment). A 1-D array is treated
+as a single use case. Everything is vectorized across rows; IRR runs a few
+Newton iterations for all rows together and falls back to bisection for
+rows where Newton does not converge.
+
+The specification metrics in src/roi_calculations.py (npv_10_percent,
+payback_period_years, ...) stay on their fixed 10% / 3-year formulas; this
+engine adds the configurable ones next to them.
+"""
+
+from typing import Dict, Sequence, Union
+
+import numpy as np
+
+from src.env_settings import env_float, env_int
+
+DEFAULT_HORIZON_YEARS = env_int("ROI_HORIZON_YEARS", 3, minimum=1)
+DEFAULT_DISCOUNT_RATE = env_float("ROI_DISCOUNT_RATE", 0.10)
+MAX_HORIZON_YEARS = 50
+
+# A single rate for every year, or one spot rate per year (the last one
+# applies to any later years)
+Discount = Union[float, Sequence[float]]
+
+IRR_TOLERANCE = 1e-10
+IRR_NEWTON_ITERATIONS = 50
+IRR_BISECTION_ITERATIONS = 200
+# IRR search range (as a rate, so -0.99 is -99%)
+IRR_MIN = -0.99
+IRR_MAX = 1e6
+
+
+def _rows(cash_flows) -> np.ndarray:
+    flows = np.asarray(cash_flows, dtype=np.float64)
+    return flows[None, :] if flows.ndim == 1 else flows
+
+
+def _result(values: np.ndarray, cash_flows) -> np.ndarray:
+    return values[0] if np.ndim(cash_flows) == 1 else values
+
+
+def use_case_cash_flows(
+    initial_cost,
+    near_term_annual_cost,
+    long_term_annual_cost,
+    near_term_annual_benefit,
+    long_term_annual_benefit,
+    horizon_years: int = DEFAULT_HORIZON_YEARS
+) -> np.ndarray:
+    """
+    Cash flows of use cases over horizon_years, shape (n, horizon_years + 1).
+
+    Year 0 is -initial_cost, year 1 the near-term net benefit and every
+    later year the long-term net benefit (the specification's 3-year model
+    extended to any horizon).
+    """
+    if not 1 <= horizon_years <= MAX_HORIZON_YEARS:
+        raise ValueError(f"horizon_years must be between 1 and {MAX_HORIZON_YEARS}")
+    initial_cost = np.asarray(initial_cost, dtype=np.float64)
+    near_term = np.asarray(near_term_annual_benefit, dtype=np.float64) - np.asarray(near_term_annual_cost, dtype=np.float64)
+    long_term = np.asarray(long_term_annual_benefit, dtype=np.float64) - np.asarray(long_term_annual_cost, dtype=np.float64)
+
+    flows = np.empty((initial_cost.size, horizon_years + 1))
+    flows[:, 0] = -initial_cost
+    flows[:, 1] = near_term
+    flows[:, 2:] = long_term.reshape(-1, 1)
+    return flows
+
+
+def discount_factors(discount: Discount, years: int) -> np.ndarray:
+    """
+    Factors for years 0..years: (1 + r_t) ** -t, where r_t is the rate
+    for year t (one rate, or a per-year spot curve).
+    """
+    rates = np.atleast_1d(np.asarray(discount, dtype=np.float64))
+    if rates.size == 0:
+        raise ValueError("discount curve is empty")
+    if np.any(rates <= -1):
+        raise ValueError("discount rates must be above -100%")
+    t = np.arange(years + 1)
+    per_year = rates[np.minimum(np.maximum(t - 1, 0), rates.size - 1)]
+    return (1 + per_year) ** -t
+
+
+def npv(cash_flows, discount: Discount = DEFAULT_DISCOUNT_RATE) -> np.ndarray:
+    """Net present value of every row of cash_flows."""
+    flows = _rows(cash_flows)
+    return _result(flows @ discount_factors(discount, flows.shape[1] - 1), cash_flows)
+
+
+def _npv_at(flows: np.ndarray, rate: np.ndarray) -> np.ndarray:
+    t = np.arange(flows.shape[1])
+    return np.sum(flows * (1 + rate[:, None]) ** -t, axis=1)
+
+
+def irr(cash_flows, guess: float = DEFAULT_DISCOUNT_RATE) -> np.ndarray:
+    """
+    Internal rate of return of every row of cash_flows (as a rate, 0.25 is
+    25%); NaN where there is none.
+
+    Rows whose flows never change sign have no IRR. Newton's method starts
+    from `guess` for all rows at once; rows that diverge, leave
+    [IRR_MIN, IRR_MAX] or do not converge are solved by bisection instead.
+    For unconventional flows with several IRRs, the one found is the
+    Newton root nearest the guess where Newton converges.
+    """
+    flows = _rows(cash_flows)
+    n, periods = flows.shape
+    t = np.arange(periods)
+    result = np.full(n, np.nan)
+
+    solvable = np.any(flows > 0, axis=1) & np.any(flows < 0, axis=1)
+    rate = np.full(n, float(guess))
+    active = solvable.copy()
+
+    with np.errstate(all="ignore"):
+        for _ in range(IRR_NEWTON_ITERATIONS):
+            if not active.any():
+                break
+            rows = np.flatnonzero(active)
+            f_rows = flows[rows]
+            base = 1 + rate[rows, None]
+            value = np.sum(f_rows * base ** -t, axis=1)
+            slope = np.sum(-t * f_rows * base ** (-t - 1), axis=1)
+            step = value / slope
+            new_rate = rate[rows] - step
+
+            failed = ~np.isfinite(new_rate) | (new_rate <= IRR_MIN) | (new_rate >= IRR_MAX)
+            done = ~failed & (np.abs(step) <= IRR_TOLERANCE * (1 + np.abs(new_rate)))
+            rate[rows] = np.where(failed, rate[rows], new_rate)
+            result[rows[done]] = new_rate[done]
+            active[rows[done | failed]] = False
+
+        # Rows that failed or ran out of Newton iterations
+        pending = np.flatnonzero(solvable & np.isnan(result))
+        if pending.size:
+            result[pending] = _bisect(flows[pending])
+
+    return _result(result, cash_flows)
+
+
+def _bisect(flows: np.ndarray) -> np.ndarray:
+    """IRR by bisection over [IRR_MIN, IRR_MAX]; NaN where no sign change brackets a root."""
+    n = flows.shape[0]
+    lo = np.full(n, IRR_MIN)
+    hi = np.full(n, IRR_MAX)
+    f_lo = _npv_at(flows, lo)
+    f_hi = _npv_at(flows, hi)
+    bracketed = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi))
+
+    for _ in range(IRR_BISECTION_ITERATIONS):
+        mid = (lo + hi) / 2
+        f_mid = _npv_at(flows, mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+        if np.all((hi - lo) <= IRR_TOLERANCE * (1 + np.abs(lo))):
+            break
+
+    return np.where(bracketed, (lo + hi) / 2, np.nan)
+
+
+def payback_months(cash_flows) -> np.ndarray:
+    """
+    Months until cumulative cash flow turns non-negative (NaN if it never
+    does within the horizon). Cash flows are assumed to arrive evenly
+    through each year, so payback partway through year t is interpolated.
+    """
+    flows = _rows(cash_flows)
+    cumulative = np.cumsum(flows, axis=1)
+    paid = cumulative >= 0
+    year = np.argmax(paid, axis=1)
+    never = ~paid.any(axis=1)
+
+    rows = np.arange(flows.shape[0])
+    previous = cumulative[rows, np.maximum(year - 1, 0)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(year > 0, -previous / flows[rows, year], 0.0)
+    months = np.where(year > 0, (year - 1 + fraction) * 12, 0.0)
+    return _result(np.where(never, np.nan, months), cash_flows)
+
+
+def cash_flow_metrics(
+    cash_flows,
+    discount: Discount = DEFAULT_DISCOUNT_RATE
+) -> Dict[str, np.ndarray]:
+    """npv, irr and payback_months for every row of cash_flows."""
+    flows = _rows(cash_flows)
+    metrics = {
+        "npv": npv(flows, discount),
+        "irr": irr(flows),
+        "payback_months": payback_months(flows),
+    }
+    if np.ndim(cash_flows) == 1:
+        metrics = {name: values[0] for name, values in metrics.items()}
+    return metrics
@@ -0,0 +1,374 @@
+"""
+Streaming access to Claude for the conversational agent, plus a local fake
+client so the streaming path can be exercised without network or API key.
+
+Requests mark the system prompt and the stable conversation prefix as
+cacheable (prompt caching), and cache usage is tracked per session.
+
+Clients are shared process-wide per API key (see ClientRegistry) so HTTP
+connections and TLS sessions are reused across turns and sessions.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Dict, Any, List, Iterator, Optional
+
+from src.env_settings import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+MODEL = "claude-3-5-sonnet-20241022"
+MAX_TOKENS = 4000
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+_EPHEMERAL = {"type": "ephemeral"}
+
+# Client pool settings, overridable through the environment
+REQUEST_TIMEOUT_SECONDS = env_float("ANTHROPIC_TIMEOUT", 120.0, minimum=0)
+CONNECT_TIMEOUT_SECONDS = env_float("ANTHROPIC_CONNECT_TIMEOUT", 10.0, minimum=0)
+MAX_RETRIES = env_int("ANTHROPIC_MAX_RETRIES", 3, minimum=0)
+MAX_CONCURRENT_REQUESTS = env_int("ANTHROPIC_MAX_CONCURRENCY", 8, minimum=1)
+MAX_CONNECTIONS = env_int("ANTHROPIC_MAX_CONNECTIONS", 20, minimum=1)
+# How long a call waits for a concurrency slot (see agent_backend)
+SLOT_WAIT_SECONDS = 60
+
+FAKE_RESPONSE = """Thanks! Here's what I captured for your first use case:
+
+**Invoice Processing Automation** - reduce manual invoice handling in Finance.
+
+<USE_CASE_DATA>
+{
+  "id": "UC001",
+  "title": "Invoice Processing Automation",
+  "problem": "Manual invoice entry takes 3 FTE and causes late payments",
+  "kpis": ["Invoices processed per FTE", "Late payment rate"],
+  "expected_benefits": {
+    "near_term_annual_benefit": 180000,
+    "long_term_annual_benefit": 260000,
+    "soft_benefits": ["Fewer late payment penalties"]
+  },
+  "costs": {
+    "initial_cost": 90000,
+    "near_term_annual_cost": 20000,
+    "long_term_annual_cost": 15000
+  },
+  "effort_score_1_to_10": 4,
+  "risk": {
+    "probability_0_to_1": 0.2,
+    "impact_0_to_1": 0.3,
+    "risks_list": ["Vendor format variety"]
+  },
+  "dependencies": []
+}
+</USE_CASE_DATA>
+
+What other processes take up the most time for your team?"""
+
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content)
+
+
+def build_message_request(
+    messages: List[Dict[str, Any]],
+    system: str,
+    model: str = MODEL,
+    max_tokens: int = MAX_TOKENS,
+    cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Keyword arguments for messages.create()/messages.stream().
+
+    With cache=True, two cache breakpoints are set:
+    - the system prompt, which never changes
+    - the last message before the newest turn, so the whole earlier
+      conversation is read from cache on the next request
+    """
+    if not cache:
+        return {"model": model, "max_tokens": max_tokens, "system": system, "messages": messages}
+
+    request_messages = list(messages)
+    if len(request_messages) >= 2:
+        prefix_end = request_messages[-2]
+        request_messages[-2] = {
+            **prefix_end,
+            "content": [{"type": "text", "text": _text_of(prefix_end["content"]), "cache_control": _EPHEMERAL}]
+        }
+
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": [{"type": "text", "text": system, "cache_control": _EPHEMERAL}],
+        "messages": request_messages,
+        "extra_headers": {"anthropic-beta": PROMPT_CACHING_BETA}
+    }
+
+
+class CacheStats:
+    """Per-session prompt-cache accounting from response usage."""
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.input_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_creation_tokens = 0
+
+    def record(self, usage) -> None:
+        """Add one response's usage; a hit is any request that read from cache."""
+        if usage is None:
+            return
+        read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        created = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self.requests += 1
+        self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+        self.cache_read_tokens += read
+        self.cache_creation_tokens += created
+        if read:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cache_hits / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "input_tokens": self.input_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_creation_tokens": self.cache_creation_tokens
+        }
+
+
+class _FakeStream:
+    """Context manager mimicking anthropic's MessageStream.text_stream."""
+
+    def __init__(self, text: str, chunk_size: int, delay: float, usage):
+        self._text = text
+        self._chunk_size = chunk_size
+        self._delay = delay
+        self._usage = usage
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for i in range(0, len(self._text), self._chunk_size):
+            if self._delay:
+                time.sleep(self._delay)
+            yield self._text[i:i + self._chunk_size]
+
+    def get_final_text(self) -> str:
+        return self._text
+
+    def get_final_message(self):
+        return SimpleNamespace(usage=self._usage)
+
+
+class _FakeMessages:
+    def __init__(self, client: "FakeStreamingClient"):
+        self._client = client
+
+    def stream(self, **kwargs) -> _FakeStream:
+        self._client.requests.append(kwargs)
+        usage = self._client.simulate_usage(kwargs)
+        return _FakeStream(self._client.response_text, self._client.chunk_size, self._client.delay, usage)
+
+
+class FakeStreamingClient:
+    """
+    Offline stand-in for anthropic.Anthropic that streams a canned response
+    in fixed-size chunks. Every request's kwargs are kept in `requests`, and
+    usage mimics prompt caching: text up to a cache breakpoint seen in an
+    earlier request counts as cache reads, otherwise as cache writes.
+    """
+
+    def __init__(self, response_text: str = FAKE_RESPONSE, chunk_size: int = 16, delay: float = 0.01):
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.requests: List[Dict[str, Any]] = []
+        self.messages = _FakeMessages(self)
+        self._cached_prefixes = set()
+
+    def simulate_usage(self, request: Dict[str, Any]):
+        """Token usage for a request, approximating 4 characters per token."""
+        system = request.get("system", "")
+        segments = system if isinstance(system, list) else [{"type": "text", "text": system}]
+        segments = segments + [
+            block
+            for message in request.get("messages", [])
+            for block in (message["content"] if isinstance(message["content"], list)
+                          else [{"type": "text", "text": message["content"]}])
+        ]
+
+        prefix = ""
+        cached_prefix = ""
+        for block in segments:
+            prefix += block.get("text", "")
+            if "cache_control" in block:
+                cached_prefix = prefix
+        total_tokens = len(prefix) // 4
+        cached_tokens = len(cached_prefix) // 4
+
+        if not cached_prefix:
+            return SimpleNamespace(input_tokens=total_tokens, output_tokens=len(self.response_text) // 4,
+                                   cache_read_input_tokens=0, cache_creation_input_tokens=0)
+        read = max((len(p) // 4 for p in self._cached_prefixes if cached_prefix.startswith(p)), default=0)
+        self._cached_prefixes.add(cached_prefix)
+        return SimpleNamespace(
+            input_tokens=total_tokens - cached_tokens,
+            output_tokens=len(self.response_text) // 4,
+            cache_read_input_tokens=read,
+            cache_creation_input_tokens=cached_tokens - read
+        )
+
+
+class ResponseStream:
+    """
+    Iterate the text deltas of one streaming Claude call.
+
+    Timings are available once iteration starts, usage once it ends:
+    - ttft_seconds: time from request to first text delta
+    - total_seconds: time until the stream finished
+    - usage: the response's token usage, including cache reads/writes
+    """
+
+    def __init__(
+        self,
+        client,
+        messages: List[Dict[str, Any]],
+        system: str,
+        model: str = MODEL,
+        max_tokens: int = MAX_TOKENS,
+        cache: bool = True
+    ):
+        self._client = client
+        self._request = build_message_request(messages, system, model=model, max_tokens=max_tokens, cache=cache)
+        self.ttft_seconds: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self.usage = None
+        self.text = ""
+
+    def __iter__(self) -> Iterator[str]:
+        started = time.perf_counter()
+        parts = []
+        with self._client.messages.stream(**self._request) as stream:
+            for delta in stream.text_stream:
+                if self.ttft_seconds is None:
+                    self.ttft_seconds = time.perf_counter() - started
+                    logger.info("Claude stream time to first token: %.3fs", self.ttft_seconds)
+                parts.append(delta)
+                yield delta
+            self.usage = stream.get_final_message().usage
+
+        self.text = "".join(parts)
+        self.total_seconds = time.perf_counter() - started
+        logger.info(
+            "Claude stream finished in %.3fs (%d chars, %d cache-read tokens)",
+            self.total_seconds,
+            len(self.text),
+            getattr(self.usage, "cache_read_input_tokens", 0) or 0
+        )
+
+
+class ClientRegistry:
+    """
+    Process-wide Anthropic clients keyed by API key.
+
+    - One client (and one pooled httpx connection pool) per key
+    - Timeouts and retries (exponential backoff, handled by the SDK on
+      429/5xx/connection errors) come from the ANTHROPIC_* settings
+    - Concurrent requests are capped by the agent backend, which closes the
+      clients on shutdown
+    """
+
+    def __init__(
+        self,
+        timeout: float = REQUEST_TIMEOUT_SECONDS,
+        connect_timeout: float = CONNECT_TIMEOUT_SECONDS,
+        max_retries: int = MAX_RETRIES,
+        max_connections: int = MAX_CONNECTIONS,
+        use_fake_client: bool = False
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.use_fake_client = use_fake_client
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(api_key: str) -> str:
+        # Keys are never held as dict keys in plain text
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def _create(self, api_key: str):
+        if self.use_fake_client:
+            return FakeStreamingClient()
+
+        import httpx
+        from anthropic import Anthropic, DefaultHttpxClient
+
+        http_client = DefaultHttpxClient(
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+        )
+        return Anthropic(
+            api_key=api_key,
+            max_retries=self.max_retries,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            http_client=http_client
+        )
+
+    def get(self, api_key: str):
+        """Return the shared client for this API key, creating it once."""
+        key = self._key(api_key or "")
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create(api_key)
+                self._clients[key] = client
+            return client
+
+    def close(self):
+        """Close every pooled client's connections."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            close = getattr(client, "close", None)
+            if close:
+                close()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Return the process-wide client registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry(use_fake_client=bool(os.environ.get("ROI_AGENT_FAKE_CLIENT")))
+        return _registry
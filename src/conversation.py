@@ -0,0 +1,190 @@
+"""
+Context-window management for long interview conversations.
+
+Older turns are compacted into a structured summary built from the use
+cases and organization data already extracted from them; recent turns are
+sent verbatim. Token counts are estimated from character length.
+
+A compaction is kept (same boundary, same summary text) until the
+conversation outgrows the budget again, so the prompt prefix stays
+identical between turns and remains readable from the prompt cache.
+"""
+
+import json
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional
+
+# Rough average for English text with Claude's tokenizer
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 12_000
+DEFAULT_KEEP_RECENT = 6
+# Use cases listed individually in the summary (highest risk-adjusted value
+# first); the rest are only counted in the totals
+SUMMARY_MAX_USE_CASES = 15
+# Share of the budget a fresh compaction fills, leaving room for the turns
+# that follow before the boundary has to move again
+COMPACT_FILL_RATIO = 0.6
+# Recent calls whose token accounting is kept in `turns`; totals cover all calls
+TURN_HISTORY = 50
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a string."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def build_state_summary(
+    use_cases: List[Dict[str, Any]],
+    org_info: Optional[Dict[str, Any]],
+    compacted_turns: int,
+    max_use_cases: int = SUMMARY_MAX_USE_CASES
+) -> str:
+    """
+    Structured recap of everything captured in the compacted turns: the
+    top max_use_cases use cases by risk-adjusted value, plus portfolio totals.
+    """
+    lines = [
+        f"[Conversation summary: {compacted_turns} earlier messages were compacted. "
+        "Do not re-ask for details captured below.]",
+        "",
+        "Organization:",
+        json.dumps(org_info, indent=2, default=str) if org_info else "(not captured yet)",
+        "",
+        f"Use cases captured so far ({len(use_cases)}):"
+    ]
+    ranked = sorted(use_cases, key=lambda uc: uc.get("risk_adjusted_value") or 0, reverse=True)
+    for uc in ranked[:max_use_cases]:
+        benefits = uc.get("expected_benefits", {}) or {}
+        costs = uc.get("costs", {}) or {}
+        risk = uc.get("risk", {}) or {}
+        lines.append(
+            f"- {uc.get('id', 'UC')} {uc.get('title', 'Untitled')}: "
+            f"Year 1 benefit ${benefits.get('near_term_annual_benefit', 0) or 0:,.0f}, "
+            f"Years 2-3 benefit ${benefits.get('long_term_annual_benefit', 0) or 0:,.0f}/year, "
+            f"initial cost ${costs.get('initial_cost', 0) or 0:,.0f}, "
+            f"annual cost ${costs.get('near_term_annual_cost', 0) or 0:,.0f}, "
+            f"effort {uc.get('effort_score_1_to_10', 'N/A')}/10, "
+            f"risk p={risk.get('probability_0_to_1', 'N/A')} impact={risk.get('impact_0_to_1', 'N/A')}"
+        )
+    if len(ranked) > max_use_cases:
+        rest = ranked[max_use_cases:]
+        lines.append(f"- ... and {len(rest)} more")
+    if use_cases:
+        total_benefit = sum((uc.get("expected_benefits") or {}).get("near_term_annual_benefit", 0) or 0 for uc in use_cases)
+        total_cost = sum((uc.get("costs") or {}).get("initial_cost", 0) or 0 for uc in use_cases)
+        total_effort = sum(uc.get("effort_score_1_to_10", 0) or 0 for uc in use_cases)
+        lines.append(
+            f"Totals: Year 1 benefit ${total_benefit:,.0f}, initial cost ${total_cost:,.0f}, effort {total_effort}"
+        )
+    else:
+        lines.append("(none yet)")
+    return "\n".join(lines)
+
+
+class ConversationManager:
+    """
+    Builds the message list sent to Claude under a token budget.
+
+    When the full history exceeds token_budget, messages before the recent
+    window are replaced by build_state_summary(), prepended to the first
+    kept user message so roles still alternate. At least keep_recent
+    messages are always sent verbatim.
+
+    A compaction fills COMPACT_FILL_RATIO of the budget and is then reused
+    unchanged while the conversation still fits, so consecutive requests
+    share their prefix. Each call appends its token accounting to `turns`
+    (the last TURN_HISTORY calls); total_tokens_saved covers every call.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, keep_recent: int = DEFAULT_KEEP_RECENT):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.turns: Deque[Dict[str, int]] = deque(maxlen=TURN_HISTORY)
+        self._tokens_saved = 0
+        self._boundary = 0  # messages before this index are summarized
+        self._summary = ""
+
+    def build_messages(
+        self,
+        messages: List[Dict[str, Any]],
+        use_cases: Optional[List[Dict[str, Any]]] = None,
+        org_info: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, str]]:
+        """Return API messages (role/content only) that fit the budget."""
+        api_messages = [{"role": m["role"], "content": m["content"]} for m in messages]
+        sizes = [estimate_tokens(m["content"]) for m in api_messages]
+        full_tokens = sum(sizes)
+
+        if full_tokens <= self.token_budget:
+            self._boundary, self._summary = 0, ""
+            self._record(full_tokens, full_tokens, 0)
+            return api_messages
+
+        # Keep the current compaction while the conversation still fits
+        start = self._boundary
+        if not (0 < start < len(api_messages)) or (
+            estimate_tokens(self._summary) + sum(sizes[start:]) > self.token_budget
+        ):
+            start = self._compaction_start(api_messages, sizes, use_cases or [], org_info)
+            if start is None:
+                self._boundary, self._summary = 0, ""
+                self._record(full_tokens, full_tokens, 0)
+                return api_messages
+            self._boundary = start
+            self._summary = build_state_summary(use_cases or [], org_info, start)
+
+        recent = api_messages[start:]
+        recent[0] = {
+            "role": "user",
+            "content": f"{self._summary}\n\n---\n\n{recent[0]['content']}"
+        }
+        sent_tokens = sum(estimate_tokens(m["content"]) for m in recent)
+        self._record(full_tokens, sent_tokens, start)
+        return recent
+
+    def _compaction_start(
+        self,
+        api_messages: List[Dict[str, str]],
+        sizes: List[int],
+        use_cases: List[Dict[str, Any]],
+        org_info: Optional[Dict[str, Any]]
+    ) -> Optional[int]:
+        """
+        Index of the first verbatim message for a fresh compaction, or None
+        when compacting would not send fewer tokens than the full history.
+        """
+        summary_tokens = estimate_tokens(build_state_summary(use_cases, org_info, len(api_messages)))
+        available = int(self.token_budget * COMPACT_FILL_RATIO) - summary_tokens
+
+        # Grow the verbatim window from the end while it fits
+        start = len(api_messages)
+        used = 0
+        while start > 0:
+            size = sizes[start - 1]
+            if len(api_messages) - start >= self.keep_recent and used + size > available:
+                break
+            used += size
+            start -= 1
+
+        # The window has to open with a user message
+        while start < len(api_messages) and api_messages[start]["role"] != "user":
+            start += 1
+        if start >= len(api_messages) or start == 0:
+            return None
+        if summary_tokens + sum(sizes[start:]) >= sum(sizes):
+            return None
+        return start
+
+    def _record(self, full_tokens: int, sent_tokens: int, compacted: int):
+        tokens_saved = max(full_tokens - sent_tokens, 0)
+        self._tokens_saved += tokens_saved
+        self.turns.append({
+            "full_tokens": full_tokens,
+            "sent_tokens": sent_tokens,
+            "tokens_saved": tokens_saved,
+            "compacted_messages": compacted
+        })
+
+    @property
+    def total_tokens_saved(self) -> int:
+        return self._tokens_saved
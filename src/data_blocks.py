@@ -0,0 +1,153 @@
+"""
+Incremental parsing of the agent's XML data blocks
+(<USE_CASE_DATA>, <ORG_DATA>, <EFFORT_BUDGET>, <GENERATE_CANVAS>).
+
+One pass over the text both strips the blocks for display and parses their
+JSON, whether the text arrives whole or in streamed chunks.
+"""
+
+import json
+from typing import Dict, Any, List, Tuple
+
+DATA_BLOCK_TAGS = ("USE_CASE_DATA", "ORG_DATA", "EFFORT_BUDGET", "GENERATE_CANVAS")
+
+_OPEN_TAGS = {f"<{tag}>": tag for tag in DATA_BLOCK_TAGS}
+_MAX_OPEN_TAG = max(len(open_tag) for open_tag in _OPEN_TAGS)
+
+
+class DataBlockParser:
+    """
+    Single-pass parser for data blocks in text that may arrive in chunks.
+
+    feed() returns the displayable part of each chunk as soon as it is known
+    not to belong to a data block; a possible partial opening tag at the end
+    of a chunk is held back until the next chunk decides it. Each block is
+    parsed when its closing tag arrives:
+    - use_cases: every USE_CASE_DATA payload
+    - org_data / effort_budget: the first ORG_DATA / EFFORT_BUDGET payload
+    - generate_canvas: True once a GENERATE_CANVAS block is seen
+    - errors: blocks whose JSON could not be parsed (never raised)
+    """
+
+    def __init__(self):
+        self.blocks: List[Tuple[str, str]] = []
+        self.use_cases: List[Dict[str, Any]] = []
+        self.org_data = None
+        self.effort_budget = None
+        self.generate_canvas = False
+        self.errors: List[Dict[str, str]] = []
+        self.display_text = ""
+        self._buffer = ""
+        self._tag = None
+
+    def _complete_block(self, tag: str, content: str):
+        self.blocks.append((tag, content))
+        if tag == "GENERATE_CANVAS":
+            self.generate_canvas = True
+            return
+        # Only the first ORG_DATA / EFFORT_BUDGET block is used
+        if (tag == "ORG_DATA" and self.org_data is not None) or \
+                (tag == "EFFORT_BUDGET" and self.effort_budget is not None):
+            return
+
+        try:
+            payload = json.loads(content)
+        except ValueError as e:
+            self.errors.append({"tag": tag, "error": str(e), "content": content})
+            return
+
+        if tag == "USE_CASE_DATA":
+            self.use_cases.append(payload)
+        elif tag == "ORG_DATA":
+            self.org_data = payload
+        else:
+            self.effort_budget = payload
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that can be displayed now."""
+        self._buffer += chunk
+        visible = []
+
+        while self._buffer:
+            if self._tag is not None:
+                close_tag = f"</{self._tag}>"
+                end = self._buffer.find(close_tag)
+                if end < 0:
+                    break
+                self._complete_block(self._tag, self._buffer[:end])
+                self._buffer = self._buffer[end + len(close_tag):]
+                self._tag = None
+                continue
+
+            start = self._buffer.find("<")
+            if start < 0:
+                visible.append(self._buffer)
+                self._buffer = ""
+                break
+
+            visible.append(self._buffer[:start])
+            rest = self._buffer[start:]
+            open_tag = next((t for t in _OPEN_TAGS if rest.startswith(t)), None)
+            if open_tag:
+                self._tag = _OPEN_TAGS[open_tag]
+                self._buffer = rest[len(open_tag):]
+            elif len(rest) < _MAX_OPEN_TAG and any(t.startswith(rest) for t in _OPEN_TAGS):
+                # Could still become an opening tag; wait for more text
+                self._buffer = rest
+                break
+            else:
+                visible.append("<")
+                self._buffer = rest[1:]
+
+        visible = "".join(visible)
+        self.display_text += visible
+        return visible
+
+    def close(self) -> str:
+        """
+        Flush held-back text. An opening tag that was never closed is shown
+        as literal text and the text after it is scanned again.
+        """
+        if self._tag is None:
+            remainder = self._buffer
+            self._buffer = ""
+            self.display_text += remainder
+            return remainder
+
+        unterminated = f"<{self._tag}>{self._buffer}"
+        self._buffer = ""
+        self._tag = None
+        self.display_text += "<"
+        return "<" + self.feed(unterminated[1:]) + self.close()
+
+    def result(self) -> Dict[str, Any]:
+        """Extracted data in the shape returned by app.extract_data_blocks."""
+        return {
+            "use_cases": self.use_cases,
+            "org_data": self.org_data,
+            "effort_budget": self.effort_budget,
+            "generate_canvas": self.generate_canvas,
+            "errors": self.errors
+        }
+
+
+def parse_data_blocks(text: str) -> DataBlockParser:
+    """Parse a complete response in one pass."""
+    parser = DataBlockParser()
+    parser.feed(text)
+    parser.close()
+    return parser
+
+
+def message_display_text(message: Dict[str, Any]) -> str:
+    """
+    Chat text with data blocks removed, cached on the message dict under
+    "display_content" so history is not rescanned on every rerun.
+    """
+    if message["role"] != "assistant":
+        return message["content"]
+    display = message.get("display_content")
+    if display is None:
+        display = parse_data_blocks(message["content"]).display_text
+        message["display_content"] = display
+    return display
@@ -0,0 +1,174 @@
+"""
+Dependency graph over use cases.
+
+Built once from each use case's "dependencies" list (ids or titles of other
+use cases in the same list) and shared by portfolio selection, roadmap
+bucketing and timeline scheduling. References to use cases outside the list
+are ignored and reported in `unresolved`. Every operation is linear in the
+number of use cases plus dependency edges; subgraph() derives the graph of
+a selection (e.g. a portfolio) without resolving references again.
+"""
+
+from typing import Dict, Any, List, Iterable, Optional, Set, Tuple
+
+
+class DependencyCycleError(ValueError):
+    """Raised when use case dependencies form a cycle."""
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        super().__init__(
+            "Dependency cycle between use cases: " + " → ".join(cycle + cycle[:1])
+        )
+
+
+class DependencyGraph:
+    """
+    DAG of use cases; node i is use_cases[i].
+
+    - dependencies[i]: nodes that must come before i
+    - dependents[i]: nodes that depend on i
+    - topological_order() / levels() raise DependencyCycleError on a cycle
+    """
+
+    def __init__(self, use_cases: List[Dict[str, Any]]):
+        self.labels = [str(uc.get("id") or uc.get("title") or i) for i, uc in enumerate(use_cases)]
+        index: Dict[str, int] = {}
+        for i, uc in enumerate(use_cases):
+            if uc.get("title") is not None:
+                index.setdefault(uc["title"], i)
+        for i, uc in enumerate(use_cases):
+            if uc.get("id") is not None:
+                index[uc["id"]] = i
+
+        self._index = index
+        # References naming more than one use case (by id or title)
+        claimed: Dict[str, int] = {}
+        for i, uc in enumerate(use_cases):
+            for ref in {uc.get("id"), uc.get("title")} - {None}:
+                claimed[ref] = claimed.get(ref, 0) + 1
+        self._ambiguous = {ref for ref, count in claimed.items() if count > 1}
+
+        self.dependencies: List[List[int]] = []
+        self.dependents: List[List[int]] = [[] for _ in use_cases]
+        self.unresolved: List[Tuple[str, Any]] = []
+        for i, uc in enumerate(use_cases):
+            deps = []
+            for ref in uc.get("dependencies") or []:
+                dep = index.get(ref) if isinstance(ref, str) else None
+                if dep is None:
+                    self.unresolved.append((self.labels[i], ref))
+                elif dep != i and dep not in deps:
+                    deps.append(dep)
+                    self.dependents[dep].append(i)
+            self.dependencies.append(deps)
+
+        self._order: Optional[List[int]] = None
+        self._ranks: Optional[List[int]] = None
+        self._levels: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.dependencies)
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(deps) for deps in self.dependencies)
+
+    def topological_order(self) -> List[int]:
+        """Kahn's algorithm; ties keep the original use case order."""
+        if self._order is None:
+            remaining = [len(deps) for deps in self.dependencies]
+            order = [i for i, count in enumerate(remaining) if count == 0]
+            for i in order:
+                for dependent in self.dependents[i]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        order.append(dependent)
+            if len(order) < len(self):
+                raise DependencyCycleError([self.labels[i] for i in self._find_cycle(remaining)])
+            self._order = order
+        return self._order
+
+    def ranks(self) -> List[int]:
+        """Position of every node in topological_order()."""
+        if self._ranks is None:
+            ranks = [0] * len(self)
+            for rank, i in enumerate(self.topological_order()):
+                ranks[i] = rank
+            self._ranks = ranks
+        return self._ranks
+
+    def subgraph(self, use_cases: List[Dict[str, Any]]) -> Optional["DependencyGraph"]:
+        """
+        Graph of use_cases, a subset of this graph's use cases matched by id
+        (or title), keeping the edges between them. None when a use case
+        cannot be matched to exactly one node of its own.
+        """
+        refs = [uc.get("id") or uc.get("title") for uc in use_cases]
+        if any(ref in self._ambiguous for ref in refs):
+            return None
+        nodes = [self._index.get(ref) for ref in refs]
+        if None in nodes or len(set(nodes)) < len(nodes):
+            return None
+        node_of = {node: k for k, node in enumerate(nodes)}
+
+        graph = DependencyGraph.__new__(DependencyGraph)
+        graph.labels = [self.labels[node] for node in nodes]
+        graph._index = {ref: node_of[node] for ref, node in self._index.items() if node in node_of}
+        graph._ambiguous = self._ambiguous
+        graph.dependencies = []
+        graph.dependents = [[] for _ in nodes]
+        labels = set(graph.labels)
+        graph.unresolved = [(label, ref) for label, ref in self.unresolved if label in labels]
+        for k, node in enumerate(nodes):
+            deps = []
+            for dep in self.dependencies[node]:
+                if dep in node_of:
+                    deps.append(node_of[dep])
+                    graph.dependents[node_of[dep]].append(k)
+                else:
+                    graph.unresolved.append((graph.labels[k], self.labels[dep]))
+            graph.dependencies.append(deps)
+        graph._order = None
+        graph._ranks = None
+        graph._levels = None
+        return graph
+
+    def _find_cycle(self, remaining: List[int]) -> List[int]:
+        """
+        A cycle among the nodes Kahn could not order. Each of them still
+        has an unordered dependency, so walking those must revisit a node.
+        """
+        start = next(i for i, count in enumerate(remaining) if count > 0)
+        position: Dict[int, int] = {}
+        path = []
+        node = start
+        while node not in position:
+            position[node] = len(path)
+            path.append(node)
+            node = next(dep for dep in self.dependencies[node] if remaining[dep] > 0)
+        cycle = path[position[node]:]
+        cycle.reverse()  # dependency first
+        return cycle
+
+    def levels(self) -> List[int]:
+        """0 for use cases without dependencies, else 1 + deepest dependency."""
+        if self._levels is None:
+            levels = [0] * len(self)
+            for i in self.topological_order():
+                for dep in self.dependencies[i]:
+                    levels[i] = max(levels[i], levels[dep] + 1)
+            self._levels = levels
+        return self._levels
+
+    def prerequisites(self, nodes: Iterable[int], exclude: Optional[Set[int]] = None) -> Set[int]:
+        """All transitive dependencies of nodes, skipping (and not expanding) exclude."""
+        exclude = exclude or set()
+        found: Set[int] = set()
+        stack = list(nodes)
+        while stack:
+            for dep in self.dependencies[stack.pop()]:
+                if dep not in found and dep not in exclude:
+                    found.add(dep)
+                    stack.append(dep)
+        return found
@@ -0,0 +1,46 @@
+"""
+Numeric settings read from the environment.
+
+A malformed or out-of-range value (e.g. ROADMAP_MAX_PARALLEL=three) is
+logged as a warning and the default is used instead, so a typo in a
+deployment's environment never stops a module from importing.
+"""
+
+import os
+import logging
+from typing import Callable, Optional, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+Number = TypeVar("Number", int, float)
+
+
+def _env_number(
+    name: str,
+    default: Number,
+    parse: Callable[[str], Number],
+    kind: str,
+    minimum: Optional[Union[int, float]]
+) -> Number:
+    raw = os.environ.get(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = parse(raw.strip())
+    except ValueError:
+        logger.warning("Ignoring %s=%r: not %s; using %r", name, raw, kind, default)
+        return default
+    if minimum is not None and not value >= minimum:
+        logger.warning("Ignoring %s=%r: must be at least %r; using %r", name, raw, minimum, default)
+        return default
+    return value
+
+
+def env_int(name: str, default: int, minimum: Optional[int] = None) -> int:
+    """Integer environment variable `name`, or default if unset or invalid."""
+    return _env_number(name, default, int, "an integer", minimum)
+
+
+def env_float(name: str, default: float, minimum: Optional[float] = None) -> float:
+    """Number environment variable `name`, or default if unset or invalid."""
+    return _env_number(name, default, float, "a number", minimum)
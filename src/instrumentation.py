@@ -0,0 +1,240 @@
+"""
+Lightweight timing instrumentation for the pipeline stages.
+
+Off by default; set ROI_AGENT_METRICS=1 to record, per session and stage:
+- call and error counts
+- wall time (total, max, last)
+- allocations via tracemalloc: net bytes still held after the call and the
+  peak above the starting point (ROI_AGENT_METRICS_ALLOCATIONS=0 skips this)
+
+When off, an instrumented call costs one global flag check. Metrics are
+exported as Prometheus text or JSON lines. Only the most recently active
+METRICS_MAX_SESSIONS sessions are kept.
+"""
+
+import os
+import json
+import time
+import functools
+import threading
+import tracemalloc
+import contextvars
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Callable
+
+from src.env_settings import env_int
+
+_enabled = bool(os.environ.get("ROI_AGENT_METRICS"))
+_trace_allocations = os.environ.get("ROI_AGENT_METRICS_ALLOCATIONS", "1") != "0"
+
+_session: contextvars.ContextVar = contextvars.ContextVar("instrumentation_session", default="-")
+_NULL_STAGE = nullcontext()
+
+METRIC_PREFIX = "roi_agent_stage"
+
+# Sessions whose stage aggregates are kept (least recently active are dropped)
+METRICS_MAX_SESSIONS = env_int("ROI_AGENT_METRICS_SESSIONS", 200, minimum=1)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True, trace_allocations: Optional[bool] = None):
+    """Turn recording on or off at runtime (tracemalloc starts when needed)."""
+    global _enabled, _trace_allocations
+    _enabled = on
+    if trace_allocations is not None:
+        _trace_allocations = trace_allocations
+    if _enabled and _trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def set_session(session_id: str):
+    """Attribute stages run in the current context to session_id."""
+    _session.set(session_id)
+
+
+class MetricsRegistry:
+    """
+    Per (session, stage) aggregates, safe to update from any thread. At most
+    max_sessions sessions are kept; recording for a new one drops the
+    session that recorded least recently.
+    """
+
+    def __init__(self, max_sessions: int = METRICS_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        alloc_bytes: Optional[int] = None,
+        peak_bytes: Optional[int] = None,
+        error: bool = False,
+        session: Optional[str] = None
+    ):
+        session = session or _session.get()
+        with self._lock:
+            stages = self._sessions.get(session)
+            if stages is None:
+                stages = self._sessions[session] = {}
+                while len(self._sessions) > max(1, self.max_sessions):
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            stats = stages.get(stage)
+            if stats is None:
+                stats = stages[stage] = {
+                    "session": session,
+                    "stage": stage,
+                    "calls": 0,
+                    "errors": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "last_seconds": 0.0,
+                    "alloc_bytes": 0,
+                    "peak_alloc_bytes": 0
+                }
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["last_seconds"] = seconds
+            if alloc_bytes is not None:
+                stats["alloc_bytes"] += alloc_bytes
+            if peak_bytes is not None:
+                stats["peak_alloc_bytes"] = max(stats["peak_alloc_bytes"], peak_bytes)
+
+    def snapshot(self, session: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Copies of the aggregates, optionally for one session only."""
+        with self._lock:
+            if session is not None:
+                rows = [dict(stats) for stats in self._sessions.get(session, {}).values()]
+            else:
+                rows = [dict(stats) for stages in self._sessions.values() for stats in stages.values()]
+        return sorted(rows, key=lambda row: (row["session"], row["stage"]))
+
+    def reset(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def to_json_lines(self, session: Optional[str] = None) -> str:
+        """One JSON object per session and stage, stamped with the export time."""
+        timestamp = round(time.time(), 3)
+        return "".join(
+            json.dumps({"timestamp": timestamp, **row}, sort_keys=True) + "\n"
+            for row in self.snapshot(session)
+        )
+
+    def to_prometheus(self, session: Optional[str] = None) -> str:
+        """Prometheus text exposition format."""
+        rows = self.snapshot(session)
+        metrics = [
+            ("calls_total", "counter", "Stage calls.", "calls"),
+            ("errors_total", "counter", "Stage calls that raised.", "errors"),
+            ("seconds_total", "counter", "Wall time spent in the stage.", "total_seconds"),
+            ("seconds_max", "gauge", "Slowest single call.", "max_seconds"),
+            ("alloc_bytes_total", "counter", "Net bytes still allocated after each call (tracemalloc).", "alloc_bytes"),
+            ("peak_alloc_bytes", "gauge", "Largest allocation peak during one call (tracemalloc).", "peak_alloc_bytes"),
+        ]
+        lines = []
+        for suffix, kind, help_text, field in metrics:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for row in rows:
+                labels = f'session="{_escape_label(row["session"])}",stage="{_escape_label(row["stage"])}"'
+                lines.append(f"{name}{{{labels}}} {row[field]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+# Number of stages currently being measured; tracemalloc's peak is global,
+# so it is only reset by a stage that starts while no other one runs.
+_active = 0
+_active_lock = threading.Lock()
+
+
+class _Stage:
+    """Context manager measuring one stage call."""
+
+    __slots__ = ("name", "_started", "_memory_before", "_owns_peak")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        global _active
+        self._memory_before = None
+        self._owns_peak = False
+        if _trace_allocations and tracemalloc.is_tracing():
+            with _active_lock:
+                self._owns_peak = _active == 0
+                _active += 1
+            if self._owns_peak:
+                tracemalloc.reset_peak()
+            self._memory_before = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        seconds = time.perf_counter() - self._started
+        alloc_bytes = peak_bytes = None
+        if self._memory_before is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            alloc_bytes = max(0, current - self._memory_before)
+            if self._owns_peak:
+                peak_bytes = max(0, peak - self._memory_before)
+            with _active_lock:
+                _active -= 1
+        get_metrics_registry().record(self.name, seconds, alloc_bytes, peak_bytes, error=exc_type is not None)
+        return False
+
+
+def stage(name: str):
+    """Context manager timing a block as `name`; a shared no-op when off."""
+    return _Stage(name) if _enabled else _NULL_STAGE
+
+
+def record_stage(name: str, seconds: float):
+    """Record a stage that was timed by the caller (no allocation data)."""
+    if _enabled:
+        get_metrics_registry().record(name, seconds)
+
+
+def instrument(name: str) -> Callable:
+    """Decorator recording every call of the function as stage `name`."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+if _enabled:
+    enable(True)
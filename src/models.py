@@ -0,0 +1,73 @@
+"""
+Typed, slotted model of a use case (the USE_CASE_DATA schema in
+src/agent_prompt.py), used by portfolio selection.
+
+UseCase.from_dict does not copy: the model keeps a reference to the source
+dict and reads the other schema fields from it on access. to_dict returns
+the source itself unless the model's id, effort or scores differ from it,
+in which case it returns a shallow copy with them applied.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+
+def _source_field(key: str) -> property:
+    """Read-only attribute backed by the source dict."""
+    return property(lambda self: self.source.get(key))
+
+
+@dataclass(slots=True, eq=False)
+class UseCase:
+    """
+    View of one use case dict (`source`). id and effort are read once; the
+    other schema fields are read from the source when accessed.
+    """
+
+    source: Dict[str, Any]
+    id: Optional[str] = None
+    effort: Optional[int] = None
+
+    # Portfolio scoring (select_portfolio)
+    impact_score: Optional[float] = None
+    category: Optional[str] = None
+    efficiency: Optional[float] = None
+
+    title = _source_field("title")
+    dependencies = _source_field("dependencies")
+    near_term_roi_percent = _source_field("near_term_roi_percent")
+    long_term_roi_percent = _source_field("long_term_roi_percent")
+    npv_10_percent = _source_field("npv_10_percent")
+    payback_period_years = _source_field("payback_period_years")
+    risk_adjusted_value = _source_field("risk_adjusted_value")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UseCase":
+        """Model of a schema dict; nothing is copied."""
+        return cls(
+            data,
+            data.get("id"),
+            data.get("effort_score_1_to_10"),
+            data.get("impact_score"),
+            data.get("category"),
+            data.get("efficiency")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The source dict if the model's values match it, otherwise a shallow
+        copy with them applied.
+        """
+        source = self.source
+        changes = {
+            key: value
+            for key, value in (
+                ("id", self.id),
+                ("effort_score_1_to_10", self.effort),
+                ("impact_score", self.impact_score),
+                ("category", self.category),
+                ("efficiency", self.efficiency)
+            )
+            if value is not None and value != source.get(key)
+        }
+        return {**source, **changes} if changes else source
@@ -0,0 +1,253 @@
+"""
+Dirty tracking for the ROI → portfolio → canvas pipeline.
+
+Each derived result remembers a content hash of the inputs it was built
+from; a result is stale only when that hash changes:
+- ROI metrics: per use case, the cost/benefit/risk fields (roi_input_hash)
+  plus the horizon and discount curve
+- portfolio: id, title, effort, dependencies and risk-adjusted value of
+  every use case (ImpactScore is normalized over all of them), plus the
+  budget and selection method
+- canvas: the full use cases, organization info and the portfolio inputs
+
+Hashes are taken per use case and remembered by object identity
+(DigestMemo), so a rerun where nothing changed re-serializes nothing.
+"""
+
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from src.dependency_graph import DependencyGraph
+from src.render_cache import canvas_key
+
+# Use case fields select_portfolio reads
+PORTFOLIO_INPUT_FIELDS = ["id", "title", "effort_score_1_to_10", "dependencies", "risk_adjusted_value"]
+# Use case fields the dependency graph is built from
+GRAPH_INPUT_FIELDS = ["id", "title", "dependencies"]
+# Fields select_portfolio adds to its copies
+_ENRICHED_FIELDS = ["impact_score", "category", "efficiency"]
+
+
+class DigestMemo:
+    """
+    Per-item digests remembered by object identity.
+
+    Use case dicts are replaced rather than mutated once they are in the
+    session (merge_use_cases, update_roi and edits all build new dicts), so
+    a dict seen on the previous call still has the digest computed then.
+    Each call keeps only the items it was given, so the memo never holds
+    more than the current use cases.
+    """
+
+    def __init__(self):
+        self._memos: Dict[Callable, Tuple[tuple, Dict[int, tuple]]] = {}
+
+    def digests(self, items: List[Any], digest: Callable[..., str], *args) -> List[str]:
+        """digest(item, *args) for every item; items seen last call with the same args are not re-hashed."""
+        context, previous = self._memos.get(digest, (None, {}))
+        if context != args:
+            previous = {}
+        entries = {}
+        results = []
+        for item in items:
+            entry = previous.get(id(item))
+            if entry is None or entry[0] is not item:
+                entry = (item, digest(item, *args))
+            entries[id(item)] = entry
+            results.append(entry[1])
+        self._memos[digest] = (args, entries)
+        return results
+
+    def remembered(self, items: List[Any], digest: Callable[..., str], *args) -> List[bool]:
+        """For every item, whether it was given to the last digests(…, digest, *args) call."""
+        context, entries = self._memos.get(digest, (None, {}))
+        if context != args:
+            return [False] * len(items)
+        return [entries.get(id(item), (None,))[0] is item for item in items]
+
+
+def _combined(digests: List[str]) -> str:
+    return hashlib.sha256("".join(digests).encode("ascii")).hexdigest()
+
+
+def _portfolio_row(use_case: Dict[str, Any]) -> str:
+    return canvas_key([use_case.get(field) for field in PORTFOLIO_INPUT_FIELDS])
+
+
+def _graph_row(use_case: Dict[str, Any]) -> str:
+    return canvas_key([use_case.get(field) for field in GRAPH_INPUT_FIELDS])
+
+
+def use_cases_key(use_cases: List[Dict[str, Any]], memo: Optional[DigestMemo] = None) -> str:
+    """Hash of the full content of every use case, in order."""
+    return _combined((memo or DigestMemo()).digests(use_cases, canvas_key))
+
+
+def portfolio_fingerprint(
+    use_cases: List[Dict[str, Any]],
+    effort_budget: int,
+    method: str,
+    memo: Optional[DigestMemo] = None
+) -> str:
+    """Hash of everything select_portfolio(use_cases, effort_budget, method) depends on."""
+    rows = _combined((memo or DigestMemo()).digests(use_cases, _portfolio_row))
+    return canvas_key({"use_cases": rows, "effort_budget": effort_budget, "method": method})
+
+
+def canvas_fingerprint(
+    use_cases: List[Dict[str, Any]],
+    org_info: Optional[Dict[str, Any]],
+    portfolio: Dict[str, Any],
+    memo: Optional[DigestMemo] = None
+) -> str:
+    """Hash of the data build_canvas renders."""
+    memo = memo or DigestMemo()
+    return canvas_key({
+        "use_cases": use_cases_key(use_cases, memo),
+        "org_info": org_info or {},
+        "portfolio": portfolio_fingerprint(use_cases, portfolio["effort_budget"], portfolio["selection_method"], memo)
+    })
+
+
+def merge_use_cases(use_cases: List[Dict[str, Any]], incoming: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replace use cases whose id matches an incoming one (an edit); append the rest."""
+    merged = list(use_cases)
+    position = {uc.get("id"): i for i, uc in enumerate(merged) if uc.get("id") is not None}
+    for uc in incoming:
+        i = position.get(uc.get("id"))
+        if i is None:
+            if uc.get("id") is not None:
+                position[uc["id"]] = len(merged)
+            merged.append(uc)
+        else:
+            merged[i] = uc
+    return merged
+
+
+def rebind_portfolio(portfolio: Dict[str, Any], use_cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Portfolio whose selected/excluded entries carry the current use case
+    data. Use when only descriptive fields changed: the portfolio is still
+    current, so the scores it added (impact_score, category, efficiency) stay.
+    """
+    by_id = {uc.get("id"): uc for uc in use_cases}
+    
+    def rebind(entries):
+        return [
+            {**by_id.get(entry.get("id"), entry), **{field: entry[field] for field in _ENRICHED_FIELDS if field in entry}}
+            for entry in entries
+        ]
+    
+    return {
+        **portfolio,
+        "selected_use_cases": rebind(portfolio["selected_use_cases"]),
+        "excluded_use_cases": rebind(portfolio["excluded_use_cases"])
+    }
+
+
+class PipelineState:
+    """
+    Per-session record of which results are current.
+
+    - roi_enabled: set once ROI has been requested; from then on every new
+      or edited use case is scored by update_roi (replacing the old
+      one-shot roi_computed flag)
+    - horizon_years / discount: cash-flow settings (None for the
+      src/cashflow.py defaults); after set_finance, update_roi rescores
+      every use case
+    - record_portfolio / record_data: call when a portfolio is selected /
+      when a canvas is built or the portfolio's copies are refreshed
+    - portfolio_current / data_current: False once an input changed
+    - digests: per-use-case hashes shared by the checks above and
+      update_roi (not persisted; rebuilt on the first rerun)
+    - dependency_graph: the DependencyGraph of the current use cases,
+      shared by portfolio selection, the frontier and the canvas (not
+      persisted)
+    """
+
+    def __init__(self):
+        self.roi_enabled = False
+        self.simulate = False
+        self.horizon_years: Optional[int] = None
+        self.discount: Optional[Any] = None
+        self.roi_cache: Dict[str, Dict[str, Any]] = {}
+        self.portfolio_key: Optional[str] = None
+        self.data_key: Optional[str] = None
+        self.digests = DigestMemo()
+        self._graph: Optional[Tuple[str, DependencyGraph]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flags and fingerprints for a session snapshot (the ROI cache is rebuilt on demand)."""
+        return {
+            "roi_enabled": self.roi_enabled,
+            "simulate": self.simulate,
+            "horizon_years": self.horizon_years,
+            "discount": self.discount,
+            "portfolio_key": self.portfolio_key,
+            "data_key": self.data_key
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PipelineState":
+        state = cls()
+        state.roi_enabled = bool(data.get("roi_enabled"))
+        state.simulate = bool(data.get("simulate"))
+        state.horizon_years = data.get("horizon_years")
+        state.discount = data.get("discount")
+        state.portfolio_key = data.get("portfolio_key")
+        state.data_key = data.get("data_key")
+        return state
+
+    def enable_roi(self, simulate: bool = False):
+        if not self.roi_enabled:
+            self.roi_enabled = True
+            self.simulate = simulate
+
+    def set_finance(self, horizon_years: Optional[int], discount: Optional[Any]):
+        """Change the cash-flow horizon and discount rate (or per-year curve)."""
+        self.horizon_years = horizon_years
+        self.discount = discount
+
+    def finance(self) -> Dict[str, Any]:
+        """Cash-flow keyword arguments for the ROI functions (defaults left out)."""
+        settings = {"horizon_years": self.horizon_years, "discount": self.discount}
+        return {key: value for key, value in settings.items() if value is not None}
+
+    def update_roi(self, use_cases: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Score new or changed use cases; returns (use cases, number recomputed)."""
+        from src.roi_calculations import compute_roi_incremental
+        return compute_roi_incremental(use_cases, self.roi_cache, simulate=self.simulate, cash_flow=True, memo=self.digests, **self.finance())
+
+    def seed_roi(self, use_cases: List[Dict[str, Any]]):
+        """Reuse metrics computed elsewhere (bulk import) instead of recomputing them."""
+        if not self.simulate:
+            from src.roi_calculations import seed_roi_cache
+            seed_roi_cache(use_cases, self.roi_cache, **self.finance())
+
+    def record_portfolio(self, use_cases: List[Dict[str, Any]], org_info: Optional[Dict[str, Any]], portfolio: Dict[str, Any]):
+        self.portfolio_key = portfolio_fingerprint(
+            use_cases, portfolio["effort_budget"], portfolio["selection_method"], self.digests
+        )
+        self.record_data(use_cases, org_info, portfolio)
+
+    def record_data(self, use_cases: List[Dict[str, Any]], org_info: Optional[Dict[str, Any]], portfolio: Dict[str, Any]):
+        self.data_key = canvas_fingerprint(use_cases, org_info, portfolio, self.digests)
+
+    def portfolio_current(self, use_cases: List[Dict[str, Any]], portfolio: Dict[str, Any]) -> bool:
+        return self.portfolio_key == portfolio_fingerprint(
+            use_cases, portfolio["effort_budget"], portfolio["selection_method"], self.digests
+        )
+
+    def data_current(self, use_cases: List[Dict[str, Any]], org_info: Optional[Dict[str, Any]], portfolio: Dict[str, Any]) -> bool:
+        return self.data_key == canvas_fingerprint(use_cases, org_info, portfolio, self.digests)
+
+    def use_cases_key(self, use_cases: List[Dict[str, Any]]) -> str:
+        """use_cases_key with this session's memo (e.g. to key caches of derived views)."""
+        return use_cases_key(use_cases, self.digests)
+
+    def dependency_graph(self, use_cases: List[Dict[str, Any]]) -> DependencyGraph:
+        """DependencyGraph of use_cases, rebuilt only when an id, title or dependency list changed."""
+        key = _combined(self.digests.digests(use_cases, _graph_row))
+        if self._graph is None or self._graph[0] != key:
+            self._graph = (key, DependencyGraph(use_cases))
+        return self._graph[1]
@@ -4,13 +4,241 @@ This provides a reliable way to convert HTML to PNG without external dependencie
 """
 
 import io
+import os
 import base64
-from typing import Optional
+import atexit
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional, Callable, Any
+
+from src.env_settings import env_int
+from src.instrumentation import instrument
+
+# Pool defaults, overridable through the environment
+DEFAULT_POOL_SIZE = env_int("PNG_POOL_SIZE", 2, minimum=1)
+DEFAULT_MAX_RENDERS = env_int("PNG_POOL_MAX_RENDERS", 50, minimum=1)
+RENDER_TIMEOUT_SECONDS = 15
+WINDOW_SIZE = (1400, 1000)
+# Chrome's sandbox: "auto" disables it only when running as root (where
+# Chrome cannot start sandboxed, e.g. in most containers); "1" always
+# disables it, "0" never does
+CHROME_NO_SANDBOX = os.environ.get("CHROME_NO_SANDBOX", "auto").lower()
+
+# Resolves once the document, its web fonts and two animation frames are done,
+# i.e. the page has been laid out and painted at the current window size.
+_READY_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const fontsReady = document.fonts ? document.fonts.ready : Promise.resolve();
+fontsReady.then(() => requestAnimationFrame(() => requestAnimationFrame(() => done(true))));
+"""
+
+_CHROME_BINARIES = ["chromium", "chromium-browser", "google-chrome", "google-chrome-stable"]
+
+
+class BrowserUnavailable(RuntimeError):
+    """Selenium or a local chromedriver is not installed."""
+
+
+def _disable_sandbox() -> bool:
+    if CHROME_NO_SANDBOX == "auto":
+        return hasattr(os, "geteuid") and os.geteuid() == 0
+    return CHROME_NO_SANDBOX in ("1", "true", "yes")
+
+
+def create_chrome_driver():
+    """
+    Launch a headless Chrome/Chromium through Selenium.
+    
+    Uses CHROME_BINARY / CHROMEDRIVER from the environment, or the first
+    locally installed binaries on PATH. Raises BrowserUnavailable when
+    Selenium or chromedriver is missing rather than letting Selenium
+    Manager download a driver.
+    """
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+    except ImportError as e:
+        raise BrowserUnavailable("Selenium is not installed") from e
+    
+    driver_path = os.environ.get("CHROMEDRIVER") or shutil.which("chromedriver")
+    if not driver_path:
+        raise BrowserUnavailable("chromedriver not found (set CHROMEDRIVER or add it to PATH)")
+    
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_argument(f"--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}")
+    if _disable_sandbox():
+        chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--no-first-run")
+    
+    binary = os.environ.get("CHROME_BINARY") or next(
+        (path for path in map(shutil.which, _CHROME_BINARIES) if path), None
+    )
+    if binary:
+        chrome_options.binary_location = binary
+    
+    driver = webdriver.Chrome(options=chrome_options, service=Service(executable_path=driver_path))
+    driver.set_script_timeout(RENDER_TIMEOUT_SECONDS)
+    driver.set_page_load_timeout(RENDER_TIMEOUT_SECONDS)
+    return driver
+
+
+class _PooledBrowser:
+    """A warm browser plus the number of renders it has served."""
+    
+    __slots__ = ("driver", "renders")
+    
+    def __init__(self, driver):
+        self.driver = driver
+        self.renders = 0
+
+
+class BrowserPool:
+    """
+    Long-lived pool of warm headless browsers for HTML -> PNG rendering.
+    
+    - Up to `size` browsers are launched lazily and reused across renders
+    - Each browser is health-checked before use and replaced if it died
+    - Browsers are recycled after `max_renders` renders to cap memory growth
+    """
+    
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_renders: int = DEFAULT_MAX_RENDERS,
+        driver_factory: Callable[[], Any] = create_chrome_driver
+    ):
+        self.size = max(1, size)
+        self.max_renders = max(1, max_renders)
+        self._driver_factory = driver_factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+    
+    @staticmethod
+    def _is_healthy(browser: _PooledBrowser) -> bool:
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+    
+    def _discard(self, browser: _PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+    
+    def _checkout(self, timeout: float) -> _PooledBrowser:
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_launch = self._created < self.size
+                    if can_launch:
+                        self._created += 1
+                if can_launch:
+                    try:
+                        return _PooledBrowser(self._driver_factory())
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                browser = self._idle.get(timeout=timeout)
+            
+            if self._is_healthy(browser):
+                return browser
+            self._discard(browser)
+    
+    def _checkin(self, browser: _PooledBrowser):
+        browser.renders += 1
+        if self._closed or browser.renders >= self.max_renders:
+            self._discard(browser)
+            return
+        try:
+            # Drop the rendered page so idle browsers hold no DOM
+            browser.driver.get("about:blank")
+        except Exception:
+            self._discard(browser)
+            return
+        self._idle.put(browser)
+    
+    @contextmanager
+    def browser(self, timeout: float = RENDER_TIMEOUT_SECONDS):
+        """Borrow a healthy driver from the pool."""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        browser = self._checkout(timeout)
+        try:
+            yield browser.driver
+        except Exception:
+            self._discard(browser)
+            raise
+        else:
+            self._checkin(browser)
+    
+    def render(self, html_content: str) -> bytes:
+        """Render HTML to a full-page PNG once the page signals it is ready."""
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False, encoding="utf-8") as f:
+            f.write(html_content)
+            temp_path = f.name
+        
+        try:
+            with self.browser() as driver:
+                driver.set_window_size(*WINDOW_SIZE)
+                driver.get(f"file://{temp_path}")
+                driver.execute_async_script(_READY_SCRIPT)
+                
+                # Get full page dimensions
+                total_height = driver.execute_script("return document.body.parentNode.scrollHeight")
+                total_width = driver.execute_script("return document.body.parentNode.scrollWidth")
+                
+                # Resize to the full page with some padding and wait for the repaint
+                driver.set_window_size(total_width + 50, total_height + 100)
+                driver.execute_async_script(_READY_SCRIPT)
+                
+                return driver.get_screenshot_as_png()
+        finally:
+            os.unlink(temp_path)
+    
+    def close(self):
+        """Quit every idle browser; browsers in use are quit on return."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide browser pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
 
 
 def html_to_png(html_content: str) -> Optional[bytes]:
     """
-    Convert HTML string to PNG bytes using Selenium and Chrome.
+    Convert HTML string to PNG bytes using the shared headless Chrome pool.
     Captures the full page height dynamically.
     
     Args:
@@ -20,57 +248,9 @@ def html_to_png(html_content: str) -> Optional[bytes]:
         PNG bytes if successful, None otherwise
     """
     try:
-        from selenium import webdriver
-        from selenium.webdriver.chrome.options import Options
-        import tempfile
-        import os
-        
-        # Create Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--window-size=1400,1000")
-        
-        # Try to create driver
-        try:
-            driver = webdriver.Chrome(options=chrome_options)
-        except:
-            # If Chrome driver not available, return None
-            return None
-        
-        try:
-            # Write HTML to temp file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as f:
-                f.write(html_content)
-                temp_path = f.name
-            
-            # Load HTML in browser
-            driver.get(f"file://{temp_path}")
-            
-            # Get full page dimensions
-            total_height = driver.execute_script("return document.body.parentNode.scrollHeight")
-            total_width = driver.execute_script("return document.body.parentNode.scrollWidth")
-            
-            # Set window size to full page dimensions with some padding
-            driver.set_window_size(total_width + 50, total_height + 100)
-            
-            # Wait a moment for rendering
-            import time
-            time.sleep(1)
-            
-            # Take screenshot of full page
-            png_bytes = driver.get_screenshot_as_png()
-            
-            # Cleanup
-            os.unlink(temp_path)
-            
-            return png_bytes
-            
-        finally:
-            driver.quit()
-            
-    except Exception as e:
-        # If Selenium not available or any error, return None
+        return get_browser_pool().render(html_content)
+    except Exception:
+        # Selenium/chromedriver not installed, pool busy, or render failed
         return None
 
 
@@ -110,19 +290,16 @@ def html_to_png_pyppeteer(html_content: str) -> Optional[bytes]:
         return None
 
 
+@instrument("get_png_bytes")
 def get_png_bytes(html_content: str) -> Optional[bytes]:
     """
-    Try multiple methods to convert HTML to PNG.
-    Returns PNG bytes or None if all methods fail.
+    Convert HTML to PNG with the browser pool. pyppeteer is only tried when
+    Selenium/chromedriver is not installed; a busy pool or a failed render
+    returns None instead of launching a second browser.
     """
-    # Try Selenium first
-    result = html_to_png(html_content)
-    if result:
-        return result
-    
-    # Try pyppeteer as fallback
-    result = html_to_png_pyppeteer(html_content)
-    if result:
-        return result
-    
-    return None
+    try:
+        return get_browser_pool().render(html_content)
+    except BrowserUnavailable:
+        return html_to_png_pyppeteer(html_content)
+    except Exception:
+        return None
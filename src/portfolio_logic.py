@@ -2,7 +2,17 @@
 Portfolio selection logic following the exact specification rules.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from src.dependency_graph import DependencyGraph
+from src.instrumentation import instrument
+from src.models import UseCase
+
+# Largest knapsack table (use cases x budget points) solved exactly before
+# select_portfolio falls back to the greedy heuristic.
+OPTIMAL_MAX_CELLS = 2_000_000
 
 
 def normalize_to_scale(values: List[float], max_scale: float = 10.0) -> List[float]:
@@ -34,92 +44,379 @@ def categorize_use_case(impact_score: float, effort: int) -> str:
         return "Low Priority"
 
 
-def select_portfolio(use_cases: List[Dict[str, Any]], effort_budget: int) -> Dict[str, Any]:
+def _enrich_use_cases(use_cases: List[Dict[str, Any]]) -> List[UseCase]:
     """
-    Select optimal portfolio within effort budget.
+    Models of the use cases with impact_score, category and efficiency set.
+    The dicts are referenced, not copied; output dicts are only built for
+    the portfolio result (UseCase.to_dict).
+    """
+    enriched_cases = [UseCase.from_dict(uc) for uc in use_cases]
+    impact_scores = _impact_scores(enriched_cases)
+    for uc, impact_score in zip(enriched_cases, impact_scores):
+        uc.impact_score = round(impact_score, 2)
+    _categorize(enriched_cases, impact_scores)
+    return enriched_cases
+
+
+def _impact_scores(enriched_cases: List[UseCase]) -> List[float]:
+    """Unrounded ImpactScore (risk_adjusted_value normalized to 0-10) of each model."""
+    risk_adjusted_values = [0 if uc.risk_adjusted_value is None else uc.risk_adjusted_value for uc in enriched_cases]
+    return normalize_to_scale(risk_adjusted_values, 10.0)
+
+
+def _categorize(enriched_cases: List[UseCase], impact_scores: List[float]):
+    """Set category and efficiency from each model's current effort."""
+    for uc, impact_score in zip(enriched_cases, impact_scores):
+        effort = 5 if uc.effort is None else uc.effort  # Default to 5 if missing
+        uc.category = categorize_use_case(impact_score, effort)
+        uc.efficiency = impact_score / effort if effort > 0 else 0
+
+
+def _select_greedy(enriched_cases: List[UseCase], effort_budget: int) -> List[UseCase]:
+    """
+    Greedy selection:
+    1. Sort by ImpactScore/Effort descending
+    2. Select until budget reached
+    3. Add the best Quick Win and Big Bet if none were picked (may exceed budget)
+    """
+    sorted_cases = sorted(enriched_cases, key=lambda x: x.efficiency, reverse=True)
     
-    Steps:
-    1. Compute ImpactScore (normalized risk_adjusted_value to 0-10)
-    2. Categorize each use case
-    3. Sort by ImpactScore/Effort descending
-    4. Select until budget reached
-    5. Ensure at least 1 Quick Win and 1 Big Bet (if they exist)
-    """
-    # Step 1: Compute ImpactScore
-    risk_adjusted_values = [uc.get("risk_adjusted_value", 0) for uc in use_cases]
-    impact_scores = normalize_to_scale(risk_adjusted_values, 10.0)
-    
-    # Add impact scores and categories to use cases
-    enriched_cases = []
-    for i, uc in enumerate(use_cases):
-        uc_copy = uc.copy()
-        uc_copy["impact_score"] = round(impact_scores[i], 2)
-        effort = uc.get("effort_score_1_to_10", 5)  # Default to 5 if missing
-        uc_copy["category"] = categorize_use_case(
-            impact_scores[i],
-            effort
-        )
-        uc_copy["efficiency"] = (
-            impact_scores[i] / effort
-            if effort > 0 else 0
-        )
-        enriched_cases.append(uc_copy)
-    
-    # Step 2: Sort by efficiency (ImpactScore / Effort) descending
-    sorted_cases = sorted(enriched_cases, key=lambda x: x["efficiency"], reverse=True)
-    
-    # Step 3: Select use cases within budget
     selected = []
-    excluded = []
     total_effort = 0
     
     for uc in sorted_cases:
-        if total_effort + uc["effort_score_1_to_10"] <= effort_budget:
+        if total_effort + uc.effort <= effort_budget:
             selected.append(uc)
-            total_effort += uc["effort_score_1_to_10"]
-        else:
-            excluded.append(uc)
+            total_effort += uc.effort
     
-    # Step 4: Ensure constraints (at least 1 Quick Win and 1 Big Bet if they exist)
-    quick_wins = [uc for uc in enriched_cases if uc["category"] == "Quick Win"]
-    big_bets = [uc for uc in enriched_cases if uc["category"] == "Big Bet"]
+    quick_wins = [uc for uc in enriched_cases if uc.category == "Quick Win"]
+    big_bets = [uc for uc in enriched_cases if uc.category == "Big Bet"]
     
-    selected_ids = {uc["id"] for uc in selected}
+    selected_ids = {uc.id for uc in selected}
     
     # Add best Quick Win if none selected
-    if quick_wins and not any(uc["category"] == "Quick Win" for uc in selected):
-        best_qw = max(quick_wins, key=lambda x: x["efficiency"])
-        if best_qw["id"] not in selected_ids:
+    if quick_wins and not any(uc.category == "Quick Win" for uc in selected):
+        best_qw = max(quick_wins, key=lambda x: x.efficiency)
+        if best_qw.id not in selected_ids:
             selected.append(best_qw)
-            total_effort += best_qw["effort_score_1_to_10"]
     
     # Add best Big Bet if none selected
-    if big_bets and not any(uc["category"] == "Big Bet" for uc in selected):
-        best_bb = max(big_bets, key=lambda x: x["efficiency"])
-        if best_bb["id"] not in selected_ids:
+    if big_bets and not any(uc.category == "Big Bet" for uc in selected):
+        best_bb = max(big_bets, key=lambda x: x.efficiency)
+        if best_bb.id not in selected_ids:
             selected.append(best_bb)
-            total_effort += best_bb["effort_score_1_to_10"]
     
-    # Recalculate excluded
-    selected_ids = {uc["id"] for uc in selected}
-    excluded = [uc for uc in enriched_cases if uc["id"] not in selected_ids]
+    return selected
+
+
+def _knapsack_table(enriched_cases: List[UseCase], budget: int):
+    """
+    Exact 0/1 knapsack table over ImpactScore for every effort up to budget.
+    
+    The DP state tracks whether a Quick Win and a Big Bet have been picked,
+    so the "at least one of each" rule is part of the optimization. Returns
+    (best, prev_state) for _read_selection; the table answers every budget
+    from 0 to `budget`.
+    """
+    n = len(enriched_cases)
+    
+    # State index = 2 * has_quick_win + has_big_bet; best[s, w] is the best
+    # impact using exactly w effort points
+    best = np.full((4, budget + 1), -np.inf)
+    best[0, 0] = 0.0
+    prev_state = np.full((n, 4, budget + 1), -1, dtype=np.int8)
+    
+    for i, uc in enumerate(enriched_cases):
+        effort = max(int(round(uc.effort)), 0)
+        if effort > budget:
+            continue
+        value = uc.impact_score
+        is_qw = uc.category == "Quick Win"
+        is_bb = uc.category == "Big Bet"
+        
+        new_best = best.copy()
+        for s_old in range(4):
+            s_new = s_old | (2 if is_qw else 0) | (1 if is_bb else 0)
+            candidate = best[s_old, :budget + 1 - effort] + value
+            target = new_best[s_new, effort:]
+            better = candidate > target
+            target[better] = candidate[better]
+            prev_state[i, s_new, effort:][better] = s_old
+        best = new_best
+    return best, prev_state
+
+
+def _read_selection(enriched_cases: List[UseCase], best, prev_state, budget: int) -> List[UseCase]:
+    """
+    Best selection within `budget` from a _knapsack_table built for at least
+    that budget. When no in-budget portfolio can include a Quick Win and a
+    Big Bet, the Big Bet requirement is dropped first, then the Quick Win one.
+    """
+    best = best[:, :budget + 1]
+    need_qw = any(uc.category == "Quick Win" and uc.effort <= budget for uc in enriched_cases)
+    need_bb = any(uc.category == "Big Bet" and uc.effort <= budget for uc in enriched_cases)
+    
+    for req_qw, req_bb in [(need_qw, need_bb), (need_qw, False), (False, need_bb), (False, False)]:
+        states = [s for s in range(4) if (s & 2 or not req_qw) and (s & 1 or not req_bb)]
+        values = best[states]
+        if np.isfinite(values).any():
+            break
+    
+    # Highest impact wins; ties go to the lowest effort
+    top = values.max()
+    w = int(np.argmax((values == top).any(axis=0)))
+    state = states[int(np.argmax(values[:, w] == top))]
+    
+    # Walk back through the items taken, jumping to the previous row that
+    # changed the current cell
+    selected = []
+    i = len(enriched_cases)
+    while True:
+        taken = np.flatnonzero(prev_state[:i, state, w] >= 0)
+        if not len(taken):
+            break
+        i = int(taken[-1])
+        selected.append(enriched_cases[i])
+        state = int(prev_state[i, state, w])
+        w -= max(int(round(enriched_cases[i].effort)), 0)
+    selected.reverse()
+    return selected
+
+
+def _select_optimal(enriched_cases: List[UseCase], effort_budget: int) -> List[UseCase]:
+    """Exact 0/1 knapsack: maximize total ImpactScore with total effort <= budget."""
+    budget = max(int(effort_budget), 0)
+    best, prev_state = _knapsack_table(enriched_cases, budget)
+    return _read_selection(enriched_cases, best, prev_state, budget)
+
+
+def _enforce_dependencies(
+    enriched_cases: List[UseCase],
+    selected: List[UseCase],
+    effort_budget: int,
+    graph: DependencyGraph,
+    position: Optional[Dict[int, int]] = None
+) -> Dict[str, List[str]]:
+    """
+    Make the selection closed under dependencies, in place.
+    
+    Visiting use cases in topological order, a selected use case with an
+    unselected dependency pulls in all of its missing prerequisites if they
+    fit the budget (or the current total, if already above it); otherwise it
+    is dropped. Returns the ids added and dropped. position maps id(model)
+    to its index in enriched_cases (built here when not given).
+    """
+    if position is None:
+        position = {id(uc): i for i, uc in enumerate(enriched_cases)}
+    original = [position[id(uc)] for uc in selected]
+    chosen = set(original)
+    limit = max(effort_budget, sum(uc.effort for uc in selected))
+    total = sum(enriched_cases[i].effort for i in chosen)
+    
+    # Prerequisites pulled in come earlier in the order than the use case
+    # that needs them, so only the original selection has to be visited
+    ranks = graph.ranks()
+    for i in sorted(original, key=ranks.__getitem__):
+        if i not in chosen or all(dep in chosen for dep in graph.dependencies[i]):
+            continue
+        missing = graph.prerequisites([i], exclude=chosen)
+        extra = sum(enriched_cases[j].effort for j in missing)
+        if total + extra <= limit:
+            chosen |= missing
+            total += extra
+        else:
+            chosen.discard(i)
+            total -= enriched_cases[i].effort
+    
+    kept = set(original) & chosen
+    added = sorted(chosen - kept)
+    dropped = [i for i in original if i not in chosen]
+    selected[:] = [enriched_cases[i] for i in original if i in kept] + [enriched_cases[j] for j in added]
+    return {
+        "added": [enriched_cases[j].id for j in added],
+        "dropped": [enriched_cases[j].id for j in dropped]
+    }
+
+
+@instrument("select_portfolio")
+def select_portfolio(
+    use_cases: List[Dict[str, Any]],
+    effort_budget: int,
+    method: str = "optimal",
+    graph: Optional[DependencyGraph] = None
+) -> Dict[str, Any]:
+    """
+    Select optimal portfolio within effort budget.
+    
+    Steps:
+    1. Compute ImpactScore (normalized risk_adjusted_value to 0-10)
+    2. Categorize each use case
+    3. Select use cases:
+       - "optimal": exact knapsack maximizing total ImpactScore within the
+         budget, with at least 1 Quick Win and 1 Big Bet (if they fit)
+       - "greedy": sort by ImpactScore/Effort, fill the budget, then add a
+         Quick Win and a Big Bet if missing (may exceed the budget)
+    
+    4. Keep the selection closed under "dependencies": prerequisites of a
+       selected use case are added if they fit, else it is dropped
+    
+    Large inputs (more than OPTIMAL_MAX_CELLS DP cells) fall back to greedy.
+    Pass the DependencyGraph of use_cases to reuse one already built; a
+    dependency cycle raises DependencyCycleError.
+    """
+    if method not in ("optimal", "greedy"):
+        raise ValueError(f"Unknown selection method: {method}")
+    
+    enriched_cases = _enrich_use_cases(use_cases)
+    graph = graph or DependencyGraph(use_cases)
+    graph.topological_order()
+    
+    if method == "optimal" and len(enriched_cases) * (max(int(effort_budget), 0) + 1) > OPTIMAL_MAX_CELLS:
+        method = "greedy"
+    
+    if method == "optimal":
+        selected = _select_optimal(enriched_cases, effort_budget)
+    else:
+        selected = _select_greedy(enriched_cases, effort_budget)
+    
+    return _portfolio_result(enriched_cases, selected, effort_budget, method, graph)
+
+
+def _portfolio_result(
+    enriched_cases: List[UseCase],
+    selected: List[UseCase],
+    effort_budget: int,
+    method: str,
+    graph: DependencyGraph
+) -> Dict[str, Any]:
+    """Apply dependency closure to a raw selection and build the portfolio dict."""
+    adjustments = _enforce_dependencies(enriched_cases, selected, effort_budget, graph)
+    
+    total_effort = sum(uc.effort for uc in selected)
+    selected_ids = {uc.id for uc in selected}
+    excluded = [uc for uc in enriched_cases if uc.id not in selected_ids]
     
     # Generate rationale
     category_counts = {}
     for uc in selected:
-        cat = uc["category"]
+        cat = uc.category
         category_counts[cat] = category_counts.get(cat, 0) + 1
     
+    if method == "optimal":
+        approach = "Selection maximized total impact score within the effort budget."
+    else:
+        approach = "Selection prioritized high-impact, low-effort initiatives."
+    
     rationale = (
         f"Selected {len(selected)} use cases with total effort {total_effort}/{effort_budget}. "
         f"Portfolio includes: {', '.join(f'{count} {cat}' for cat, count in category_counts.items())}. "
-        f"Selection prioritized high-impact, low-effort initiatives."
+        f"{approach}"
     )
+    if adjustments["added"]:
+        rationale += f" Added {len(adjustments['added'])} prerequisite use case(s) required by dependencies."
+    if adjustments["dropped"]:
+        rationale += f" Dropped {len(adjustments['dropped'])} use case(s) whose dependencies did not fit the budget."
     
     return {
-        "selected_use_cases": selected,
-        "excluded_use_cases": excluded,
+        "selected_use_cases": [uc.to_dict() for uc in selected],
+        "excluded_use_cases": [uc.to_dict() for uc in excluded],
         "selection_rationale": rationale,
         "total_effort": total_effort,
-        "effort_budget": effort_budget
+        "effort_budget": effort_budget,
+        "selection_method": method,
+        "dependency_adjustments": adjustments
     }
+
+
+@instrument("portfolio_frontier")
+def portfolio_frontier(
+    use_cases: List[Dict[str, Any]],
+    max_budget: int,
+    method: str = "optimal",
+    graph: Optional[DependencyGraph] = None
+) -> Dict[str, Any]:
+    """
+    Best portfolio for every effort budget from 1 to max_budget.
+    
+    Steps:
+    1. Build the knapsack table once for the largest budget select_portfolio
+       would solve exactly (within OPTIMAL_MAX_CELLS); since it holds the best
+       impact at every exact effort, each smaller budget is read from it
+       without another DP pass. Larger budgets fall back to greedy, as in
+       select_portfolio
+    2. Apply the dependency closure per budget
+    3. Mark Pareto-efficient budgets: a budget is dominated when a smaller
+       one already reaches the same total impact
+    
+    Only the totals and the raw selection (use case indices, before the
+    dependency closure) are kept per budget; frontier_portfolio builds the
+    full portfolio for one budget, equal to select_portfolio(use_cases,
+    budget, method). graph is the DependencyGraph of use_cases, if already
+    built.
+    
+    Returns {"points": [{"budget", "total_impact", "total_effort",
+    "total_npv", "use_case_count", "pareto"}, ...], "selections":
+    {budget: {"indices", "method"}}, "selection_method"}.
+    """
+    if method not in ("optimal", "greedy"):
+        raise ValueError(f"Unknown selection method: {method}")
+    
+    max_budget = max(int(max_budget), 0)
+    enriched_cases = _enrich_use_cases(use_cases)
+    position = {id(uc): i for i, uc in enumerate(enriched_cases)}
+    graph = graph or DependencyGraph(use_cases)
+    graph.topological_order()
+    
+    # Largest budget whose table stays within OPTIMAL_MAX_CELLS
+    exact_budget = 0
+    if method == "optimal":
+        exact_budget = min(max_budget, OPTIMAL_MAX_CELLS // max(len(enriched_cases), 1) - 1)
+        if exact_budget >= 1:
+            best, prev_state = _knapsack_table(enriched_cases, exact_budget)
+    
+    points = []
+    selections = {}
+    best_impact = float("-inf")
+    for budget in range(1, max_budget + 1):
+        if budget <= exact_budget:
+            selected = _read_selection(enriched_cases, best, prev_state, budget)
+            selections[budget] = {"indices": [position[id(uc)] for uc in selected], "method": "optimal"}
+        else:
+            selected = _select_greedy(enriched_cases, budget)
+            selections[budget] = {"indices": [position[id(uc)] for uc in selected], "method": "greedy"}
+        _enforce_dependencies(enriched_cases, selected, budget, graph, position)
+        
+        total_impact = round(sum(uc.impact_score for uc in selected), 2)
+        points.append({
+            "budget": budget,
+            "total_impact": total_impact,
+            "total_effort": sum(uc.effort for uc in selected),
+            "total_npv": round(sum(uc.npv_10_percent or 0 for uc in selected), 2),
+            "use_case_count": len(selected),
+            "pareto": total_impact > best_impact
+        })
+        best_impact = max(best_impact, total_impact)
+    
+    return {
+        "points": points,
+        "selections": selections,
+        "selection_method": method
+    }
+
+
+def frontier_portfolio(
+    use_cases: List[Dict[str, Any]],
+    frontier: Dict[str, Any],
+    budget: int,
+    graph: Optional[DependencyGraph] = None
+) -> Dict[str, Any]:
+    """
+    Full portfolio for one budget of a portfolio_frontier built from the
+    same use cases (as select_portfolio would return it). graph is their
+    DependencyGraph, if already built.
+    """
+    selection = frontier["selections"][budget]
+    enriched_cases = _enrich_use_cases(use_cases)
+    graph = graph or DependencyGraph(use_cases)
+    selected = [enriched_cases[i] for i in selection["indices"]]
+    return _portfolio_result(enriched_cases, selected, budget, selection["method"], graph)
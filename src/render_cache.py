@@ -0,0 +1,165 @@
+"""
+Content-addressed cache for rendered canvas outputs (HTML, Markdown, PNG).
+
+Entries are keyed by a stable hash of the canvas dict, so an unchanged
+canvas is never rendered twice. The in-memory tier is an LRU bounded in
+bytes; an optional on-disk tier survives restarts and is shared between
+processes.
+
+Renderers are imported on first use, so importing this module stays cheap.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+from src.env_settings import env_int
+from src.file_utils import atomic_write
+
+DEFAULT_MAX_BYTES = env_int("RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024, minimum=0)
+DEFAULT_DISK_DIR = os.environ.get("RENDER_CACHE_DIR") or None
+
+_EXTENSIONS = {"html": "html", "markdown": "md", "png": "png"}
+
+
+def canvas_key(canvas: Dict[str, Any]) -> str:
+    """Stable SHA-256 of the canvas dict, independent of key order."""
+    payload = json.dumps(canvas, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Two-tier render cache.
+    
+    - Memory: LRU holding at most max_bytes of rendered output
+    - Disk (optional): one file per key and format under disk_dir
+    """
+    
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk_dir: Optional[Union[str, Path]] = DEFAULT_DISK_DIR):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _disk_path(self, key: str, kind: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.{_EXTENSIONS[kind]}"
+    
+    def _remember(self, entry: tuple, data: bytes):
+        """Insert into the memory tier and evict least recently used entries."""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(entry, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[entry] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def get(self, key: str, kind: str) -> Optional[bytes]:
+        """Look up rendered bytes in memory, then on disk."""
+        entry = (key, kind)
+        with self._lock:
+            data = self._entries.get(entry)
+            if data is not None:
+                self._entries.move_to_end(entry)
+                self.hits += 1
+                return data
+        
+        if self.disk_dir:
+            try:
+                data = self._disk_path(key, kind).read_bytes()
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(entry, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, kind: str, data: Union[str, bytes]):
+        """Store rendered output in both tiers."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._remember((key, kind), data)
+        if self.disk_dir:
+            try:
+                atomic_write(self._disk_path(key, kind), data)
+            except OSError:
+                pass
+    
+    def html(self, canvas: Dict[str, Any], key: Optional[str] = None) -> str:
+        """Visual canvas HTML, rendered at most once per canvas."""
+        key = key or canvas_key(canvas)
+        data = self.get(key, "html")
+        if data is not None:
+            return data.decode("utf-8")
+        from src.visual_canvas import generate_visual_canvas_html
+        html = generate_visual_canvas_html(canvas)
+        self.put(key, "html", html)
+        return html
+    
+    def markdown(self, canvas: Dict[str, Any], key: Optional[str] = None) -> str:
+        """Canvas Markdown, rendered at most once per canvas."""
+        key = key or canvas_key(canvas)
+        data = self.get(key, "markdown")
+        if data is not None:
+            return data.decode("utf-8")
+        from src.canvas_builder import canvas_to_markdown
+        md = canvas_to_markdown(canvas)
+        self.put(key, "markdown", md)
+        return md
+    
+    def cached_png(self, canvas: Dict[str, Any], key: Optional[str] = None) -> Optional[bytes]:
+        """PNG bytes if this canvas was already rendered, without rendering."""
+        return self.get(key or canvas_key(canvas), "png")
+    
+    def png(self, canvas: Dict[str, Any], key: Optional[str] = None) -> Optional[bytes]:
+        """Canvas PNG; failed renders (None) are not cached."""
+        key = key or canvas_key(canvas)
+        data = self.get(key, "png")
+        if data is not None:
+            return data
+        from src.png_export import get_png_bytes
+        png_bytes = get_png_bytes(self.html(canvas, key))
+        if png_bytes:
+            self.put(key, "png", png_bytes)
+        return png_bytes
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current memory usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Return the process-wide render cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
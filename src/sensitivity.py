@@ -0,0 +1,194 @@
+"""
+Sensitivity (tornado) analysis: which ROI input moves portfolio value most.
+
+Each input is scaled by factors from 1 - swing to 1 + swing across every
+use case at once:
+- initial_cost: costs.initial_cost
+- benefits: near- and long-term annual benefits
+- risk_probability: risk.probability_0_to_1 (capped at 1)
+- effort: effort_score_1_to_10 (rounded, kept within 1-10)
+
+Cost, benefit and risk scenarios keep the selected portfolio fixed and are
+scored in one compute_roi_arrays call over a (scenarios x use cases) grid.
+Effort does not enter the ROI formulas; it changes which use cases fit the
+budget, so effort scenarios re-run the portfolio selection on the scaled
+efforts and value the portfolio each one selects.
+
+The default metric is the portfolio's risk-adjusted NPV (the sum of
+risk_adjusted_value over selected use cases), since plain NPV does not
+depend on risk probability.
+"""
+
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from src.dependency_graph import DependencyGraph
+from src.env_settings import env_float
+from src.instrumentation import instrument
+from src.roi_calculations import compute_roi_arrays, _roi_input_arrays
+
+DEFAULT_SWING = env_float("SENSITIVITY_SWING", 0.2)
+# Perturbations on each side of the base case
+DEFAULT_STEPS = 10
+
+SENSITIVITY_INPUTS = {
+    "initial_cost": "Initial cost",
+    "benefits": "Benefits",
+    "risk_probability": "Risk probability",
+    "effort": "Effort",
+}
+METRICS = {
+    "risk_adjusted_value": "Risk-adjusted portfolio NPV",
+    "npv_10_percent": "Portfolio NPV (10%)",
+}
+
+
+def perturbation_factors(swing: float = DEFAULT_SWING, steps: int = DEFAULT_STEPS) -> np.ndarray:
+    """Scale factors from 1 - swing to 1 + swing, `steps` on each side, without 1 itself."""
+    if not 0 < swing < 1:
+        raise ValueError("swing must be between 0 and 1")
+    if steps < 1:
+        raise ValueError("steps must be at least 1")
+    side = np.arange(1, steps + 1) / steps * swing
+    return np.concatenate([1 - side[::-1], 1 + side])
+
+
+def _scenario_metric(
+    inputs: List[np.ndarray],
+    factors: np.ndarray,
+    metric: str
+) -> Dict[str, np.ndarray]:
+    """Portfolio metric per factor for the cost, benefit and risk inputs (one batch)."""
+    (initial_cost, near_cost, long_cost,
+     near_benefit, long_benefit, probability, impact) = inputs
+    scale = factors[:, None]
+    one = np.ones_like(scale)
+    base = np.ones((1, 1))
+
+    # Rows: the base case, then one block of len(factors) rows per input
+    grid = {
+        "initial_cost": np.vstack([base, scale, one, one]),
+        "benefits": np.vstack([base, one, scale, one]),
+        "risk_probability": np.vstack([base, one, one, scale]),
+    }
+    metrics = compute_roi_arrays(
+        initial_cost * grid["initial_cost"],
+        near_cost,
+        long_cost,
+        near_benefit * grid["benefits"],
+        long_benefit * grid["benefits"],
+        np.minimum(probability * grid["risk_probability"], 1.0),
+        impact,
+        decimals=None
+    )
+    totals = metrics[metric].sum(axis=1)
+    n = len(factors)
+    return {
+        "base": totals[0],
+        "initial_cost": totals[1:1 + n],
+        "benefits": totals[1 + n:1 + 2 * n],
+        "risk_probability": totals[1 + 2 * n:],
+    }
+
+
+def _effort_metric(
+    use_cases: List[Dict[str, Any]],
+    portfolio: Dict[str, Any],
+    factors: np.ndarray,
+    metric: str,
+    graph: Optional[DependencyGraph] = None
+) -> np.ndarray:
+    """
+    Portfolio metric per effort factor, re-selecting the portfolio each time.
+
+    The use cases are enriched and their dependency graph built once; each
+    factor only sets the scaled efforts on the models and re-runs the
+    selection and dependency closure, as select_portfolio would.
+    """
+    from src.portfolio_logic import (
+        OPTIMAL_MAX_CELLS, _enrich_use_cases, _impact_scores, _categorize,
+        _select_optimal, _select_greedy, _enforce_dependencies
+    )
+
+    values = compute_roi_arrays(*_roi_input_arrays(use_cases), decimals=None)[metric]
+    efforts = np.array([uc.get("effort_score_1_to_10", 5) for uc in use_cases], dtype=np.float64)
+    budget = portfolio["effort_budget"]
+    method = portfolio.get("selection_method", "optimal")
+    if method == "optimal" and len(use_cases) * (max(int(budget), 0) + 1) > OPTIMAL_MAX_CELLS:
+        method = "greedy"
+
+    models = _enrich_use_cases(use_cases)
+    impact_scores = _impact_scores(models)
+    position = {id(uc): i for i, uc in enumerate(models)}
+    graph = graph or DependencyGraph(use_cases)
+    graph.topological_order()
+
+    # Neighbouring factors often round to the same efforts; select once per set
+    by_efforts = {}
+    totals = []
+    for factor in factors:
+        scaled = tuple(np.clip(np.round(efforts * factor), 1, 10).astype(int).tolist())
+        if scaled not in by_efforts:
+            for uc, effort in zip(models, scaled):
+                uc.effort = effort
+            _categorize(models, impact_scores)
+            selected = _select_optimal(models, budget) if method == "optimal" else _select_greedy(models, budget)
+            _enforce_dependencies(models, selected, budget, graph, position)
+            by_efforts[scaled] = sum(values[position[id(uc)]] for uc in selected)
+        totals.append(by_efforts[scaled])
+    return np.array(totals)
+
+
+@instrument("sensitivity")
+def tornado(
+    use_cases: List[Dict[str, Any]],
+    portfolio: Dict[str, Any],
+    swing: float = DEFAULT_SWING,
+    steps: int = DEFAULT_STEPS,
+    metric: str = "risk_adjusted_value",
+    graph: Optional[DependencyGraph] = None
+) -> Dict[str, Any]:
+    """
+    Tornado data for a selected portfolio.
+
+    use_cases are all candidates (needed to re-select for effort); graph is
+    their DependencyGraph, if already built. Returns:
+    - metric, metric_label, base (portfolio value at the current inputs)
+    - factors: the scale factors applied (2 * steps of them)
+    - bars: one per input, widest swing first, each {"input", "label",
+      "low", "high" (value at 1 - swing / 1 + swing), "range",
+      "values" (value at every factor)}
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown sensitivity metric: {metric}")
+    factors = perturbation_factors(swing, steps)
+    selected = portfolio.get("selected_use_cases", [])
+
+    if selected:
+        curves = _scenario_metric(_roi_input_arrays(selected), factors, metric)
+    else:
+        curves = {"base": 0.0, **{name: np.zeros(len(factors)) for name in ("initial_cost", "benefits", "risk_probability")}}
+    curves["effort"] = _effort_metric(use_cases, portfolio, factors, metric, graph) if use_cases else np.zeros(len(factors))
+
+    bars = []
+    for name, label in SENSITIVITY_INPUTS.items():
+        values = curves[name]
+        bars.append({
+            "input": name,
+            "label": label,
+            "low": round(float(values[0]), 2),
+            "high": round(float(values[-1]), 2),
+            "range": round(float(values.max() - values.min()), 2),
+            "values": np.round(values, 2).tolist(),
+        })
+    bars.sort(key=lambda bar: bar["range"], reverse=True)
+
+    return {
+        "metric": metric,
+        "metric_label": METRICS[metric],
+        "base": round(float(curves["base"]), 2),
+        "swing": swing,
+        "factors": np.round(factors, 6).tolist(),
+        "bars": bars,
+    }
@@ -0,0 +1,319 @@
+"""
+Persistent session storage, so an interview survives browser reloads and
+can be resumed by any app replica that shares the store.
+
+Each session has:
+- an append-only message log (one record per chat message, numbered by seq)
+- the latest state snapshot: use cases, org info, portfolio, canvas and
+  phase, plus the number of messages it reflects
+
+Resuming reads the snapshot and the message log; only messages newer than
+the snapshot (the tail) are re-applied, so state is never rebuilt from the
+whole history. Writes go through a background thread (SessionWriter) that
+coalesces snapshots, so reruns never wait on disk.
+
+Backends: SQLiteSessionStore (one database file, WAL mode) and
+FileSessionStore (a directory per session). Choose with SESSION_STORE
+("sqlite", "file" or "none") and SESSION_STORE_PATH.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import queue
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from src.env_settings import env_int
+from src.file_utils import atomic_write
+
+SESSION_STORE = os.environ.get("SESSION_STORE", "sqlite").lower()
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", ".sessions")
+
+# Message fields kept in the log
+MESSAGE_FIELDS = ("role", "content", "display_content")
+
+# Sessions whose last snapshot digest the writer remembers (least recently
+# written are forgotten first; a forgotten session just rewrites its next snapshot)
+WRITTEN_DIGEST_LIMIT = env_int("SESSION_DIGEST_LIMIT", 1000, minimum=0)
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def valid_session_id(session_id: Any) -> bool:
+    """Session ids are uuid4 hex strings (also keeps file paths safe)."""
+    return isinstance(session_id, str) and bool(_SESSION_ID.match(session_id))
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+class SessionStore:
+    """
+    Storage interface shared by the backends.
+
+    - append_messages(session_id, start, messages): log messages numbered
+      start, start + 1, ...; re-appending a seq already logged is a no-op
+    - save_snapshot(session_id, state, message_count): replace the snapshot
+    - load(session_id): {"state", "message_count", "messages"} or None
+    """
+
+    def append_messages(self, session_id: str, start: int, messages: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def save_snapshot(self, session_id: str, state: Dict[str, Any], message_count: int):
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """All sessions in one SQLite database (WAL, so readers never block the writer)."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL,"
+                " created REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " session_id TEXT PRIMARY KEY, message_count INTEGER NOT NULL,"
+                " state TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def append_messages(self, session_id, start, messages):
+        now = time.time()
+        rows = [(session_id, start + i, _dumps(m), now) for i, m in enumerate(messages)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?)", rows)
+
+    def save_snapshot(self, session_id, state, message_count):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                (session_id, message_count, _dumps(state), time.time())
+            )
+
+    def load(self, session_id):
+        with self._lock:
+            snapshot = self._conn.execute(
+                "SELECT state, message_count FROM snapshots WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        if snapshot is None and not rows:
+            return None
+        return {
+            "state": json.loads(snapshot[0]) if snapshot else {},
+            "message_count": snapshot[1] if snapshot else 0,
+            "messages": [json.loads(row[0]) for row in rows]
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FileSessionStore(SessionStore):
+    """
+    One directory per session: messages.jsonl (appended, one record per
+    line) and snapshot.json (replaced atomically).
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _dir(self, session_id: str) -> Path:
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return self.root / session_id
+
+    def append_messages(self, session_id, start, messages):
+        directory = self._dir(session_id)
+        directory.mkdir(exist_ok=True)
+        lines = "".join(
+            _dumps({"seq": start + i, "message": m}) + "\n" for i, m in enumerate(messages)
+        )
+        with self._lock, open(directory / "messages.jsonl", "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save_snapshot(self, session_id, state, message_count):
+        directory = self._dir(session_id)
+        directory.mkdir(exist_ok=True)
+        atomic_write(directory / "snapshot.json", _dumps({"message_count": message_count, "state": state}))
+
+    def load(self, session_id):
+        directory = self._dir(session_id)
+        snapshot_path = directory / "snapshot.json"
+        log_path = directory / "messages.jsonl"
+        if not snapshot_path.exists() and not log_path.exists():
+            return None
+
+        snapshot = {"message_count": 0, "state": {}}
+        if snapshot_path.exists():
+            snapshot = json.loads(snapshot_path.read_text(encoding="utf-8"))
+
+        messages = []
+        if log_path.exists():
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write from a crash
+                    # Duplicate or out-of-order seqs come from retried appends
+                    if record["seq"] == len(messages):
+                        messages.append(record["message"])
+        return {"state": snapshot["state"], "message_count": snapshot["message_count"], "messages": messages}
+
+
+class SessionWriter:
+    """
+    Background writer in front of a SessionStore.
+
+    Message appends are written in order. Snapshots are coalesced: only the
+    latest pending one per session is written, and one identical to the
+    last written snapshot is skipped. Serialization happens on the writer
+    thread, so callers should pass containers they will not mutate.
+    discard() drops everything still queued for a session.
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self.errors: List[str] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending: Dict[str, tuple] = {}
+        self._pending_lock = threading.Lock()
+        self._written: "OrderedDict[str, str]" = OrderedDict()  # session -> digest of the last snapshot
+        self._discarded: set = set()
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def append_messages(self, session_id: str, start: int, messages: List[Dict[str, Any]]):
+        records = [{field: m[field] for field in MESSAGE_FIELDS if field in m} for m in messages]
+        self._queue.put(("messages", session_id, start, records))
+
+    def save_snapshot(self, session_id: str, state: Dict[str, Any], message_count: int):
+        with self._pending_lock:
+            first = session_id not in self._pending
+            self._pending[session_id] = (state, message_count)
+        if first:
+            self._queue.put(("snapshot", session_id))
+
+    def discard(self, session_id: str):
+        """Drop the session's pending snapshot and any messages queued but not yet written."""
+        with self._pending_lock:
+            self._pending.pop(session_id, None)
+            self._discarded.add(session_id)
+        # Everything queued for the session before this marker is skipped
+        self._queue.put(("discard", session_id))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written."""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item[0] == "messages":
+                    _, session_id, start, records = item
+                    if session_id not in self._discarded:
+                        self.store.append_messages(session_id, start, records)
+                elif item[0] == "snapshot":
+                    with self._pending_lock:
+                        pending = self._pending.pop(item[1], None)
+                    if pending is not None and item[1] not in self._discarded:
+                        self._write_snapshot(item[1], *pending)
+                elif item[0] == "discard":
+                    with self._pending_lock:
+                        self._discarded.discard(item[1])
+                    self._written.pop(item[1], None)
+                elif item[0] == "flush":
+                    item[1].set()
+            except Exception as e:
+                self.errors.append(f"{type(e).__name__}: {e}")
+                del self.errors[:-20]
+
+    def _write_snapshot(self, session_id: str, state: Dict[str, Any], message_count: int):
+        digest = hashlib.sha256(_dumps([state, message_count]).encode("utf-8")).hexdigest()
+        if self._written.get(session_id) == digest:
+            self._written.move_to_end(session_id)
+            return
+        self.store.save_snapshot(session_id, state, message_count)
+        self._written[session_id] = digest
+        self._written.move_to_end(session_id)
+        while len(self._written) > WRITTEN_DIGEST_LIMIT:
+            self._written.popitem(last=False)
+
+
+def restore_session(store: SessionStore, session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a session and bring its snapshot up to date with the log tail.
+
+    Messages logged after the snapshot (a crash before the snapshot was
+    written) have their USE_CASE_DATA / ORG_DATA blocks re-applied. Returns
+    {"state", "messages"} or None for an unknown session.
+    """
+    record = store.load(session_id)
+    if record is None:
+        return None
+    state = dict(record["state"])
+    messages = record["messages"]
+    tail = [m for m in messages[record["message_count"]:] if m.get("role") == "assistant"]
+    if tail:
+        from src.data_blocks import parse_data_blocks
+        from src.pipeline_state import merge_use_cases
+        for message in tail:
+            extracted = parse_data_blocks(message["content"]).result()
+            if extracted["use_cases"]:
+                state["use_cases"] = merge_use_cases(state.get("use_cases") or [], extracted["use_cases"])
+            if extracted["org_data"]:
+                state["org_info"] = extracted["org_data"]
+    return {"state": state, "messages": messages}
+
+
+_writer: Optional[SessionWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_session_writer() -> Optional[SessionWriter]:
+    """Return the process-wide writer for the configured store (None when SESSION_STORE=none)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None and SESSION_STORE != "none":
+            if SESSION_STORE == "file":
+                store = FileSessionStore(SESSION_STORE_PATH)
+            elif SESSION_STORE == "sqlite":
+                store = SQLiteSessionStore(os.path.join(SESSION_STORE_PATH, "sessions.db"))
+            else:
+                raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE}")
+            _writer = SessionWriter(store)
+            atexit.register(_writer.flush, 5)
+        return _writer
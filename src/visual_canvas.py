@@ -3,9 +3,12 @@ Visual Canvas Generator - Creates HTML/CSS representation of the AI ROI & Roadma
 matching the professional layout format.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from src.instrumentation import instrument
 
+
+@instrument("generate_visual_canvas_html")
 def generate_visual_canvas_html(canvas: Dict[str, Any]) -> str:
     """
     Generate a beautiful HTML/CSS visual representation of the canvas
@@ -239,6 +242,46 @@ def generate_visual_canvas_html(canvas: Dict[str, Any]) -> str:
             align-items: center;
         }}
         
+        .sensitivity-section {{
+            padding: 20px 30px;
+            border-bottom: 2px solid #333;
+        }}
+        
+        .tornado-row {{
+            display: grid;
+            grid-template-columns: 140px 1fr 220px;
+            gap: 12px;
+            align-items: center;
+            font-size: 12px;
+            margin-top: 8px;
+        }}
+        
+        .tornado-track {{
+            position: relative;
+            height: 18px;
+            background: #f3f4f6;
+            border-radius: 3px;
+        }}
+        
+        .tornado-axis {{
+            position: absolute;
+            left: 50%;
+            top: -4px;
+            bottom: -4px;
+            border-left: 2px solid #333;
+        }}
+        
+        .tornado-bar {{
+            position: absolute;
+            top: 0;
+            bottom: 0;
+            border-radius: 3px;
+        }}
+        
+        .tornado-range {{
+            color: #666;
+        }}
+        
         .footer {{
             padding: 15px 30px;
             text-align: center;
@@ -575,6 +618,8 @@ def generate_visual_canvas_html(canvas: Dict[str, Any]) -> str:
             </div>
         </div>
         
+        {_sensitivity_html(canvas.get('Sensitivity'))}
+        
         <!-- Footer -->
         <div class="footer">
             {canvas['Footer']['CreditLine']}
@@ -585,3 +630,42 @@ def generate_visual_canvas_html(canvas: Dict[str, Any]) -> str:
 """
     
     return html
+
+
+def _sensitivity_html(sensitivity: Optional[Dict[str, Any]]) -> str:
+    """Tornado chart for the canvas (empty without a Sensitivity section)."""
+    if not sensitivity or not sensitivity.get("bars"):
+        return ""
+    base = sensitivity["base"]
+    swing = f"{sensitivity['swing']:.0%}"
+    # Half the track width is the widest move away from the base value
+    scale = max(
+        max(abs(min(bar["values"]) - base), abs(max(bar["values"]) - base))
+        for bar in sensitivity["bars"]
+    ) or 1.0
+    
+    rows = []
+    for bar in sensitivity["bars"]:
+        start = 50 + (min(bar["values"]) - base) / scale * 50
+        end = 50 + (max(bar["values"]) - base) / scale * 50
+        # Green when raising the input raises the value
+        color = "#16a34a" if bar["high"] >= bar["low"] else "#dc2626"
+        rows.append(f"""
+            <div class="tornado-row">
+                <div><strong>{bar['label']}</strong></div>
+                <div class="tornado-track">
+                    <div class="tornado-bar" style="left: {start:.2f}%; width: {max(end - start, 0.5):.2f}%; background: {color};"></div>
+                    <div class="tornado-axis"></div>
+                </div>
+                <div class="tornado-range">-{swing}: ${bar['low']:,.0f} &middot; +{swing}: ${bar['high']:,.0f}</div>
+            </div>""")
+    
+    return f"""<!-- Sensitivity -->
+        <div class="sensitivity-section">
+            <div class="section-title">Sensitivity</div>
+            <div class="section-subtitle">
+                How {sensitivity['metric_label'].lower()} (${base:,.0f} today) moves when each input changes by
+                &plusmn;{swing} across every use case. Effort changes re-select the portfolio within the same budget.
+            </div>
+            {''.join(rows)}
+        </div>"""